@@ -1,5 +1,29 @@
 import streamlit as st
-import requests
+
+# Feature cards (static HTML)
+TRAINING_CARD = """
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; text-align: center; color: white;">
+        <h2>📚</h2>
+        <h3>Training Agent</h3>
+        <p>Get personalized training content</p>
+    </div>
+    """
+
+MENTOR_CARD = """
+    <div style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); padding: 20px; border-radius: 10px; text-align: center; color: white;">
+        <h2>🤝</h2>
+        <h3>Mentor Agent</h3>
+        <p>Get expert guidance & answers</p>
+    </div>
+    """
+
+ASSESSMENT_CARD = """
+    <div style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); padding: 20px; border-radius: 10px; text-align: center; color: white;">
+        <h2>📊</h2>
+        <h3>Assessment</h3>
+        <p>Evaluate your competency</p>
+    </div>
+    """
 
 st.set_page_config(
     page_title="AI Coach",
@@ -25,32 +49,9 @@ st.markdown("### 🚀 Available Features")
 
 col1, col2, col3 = st.columns(3)
 
-with col1:
-    st.markdown("""
-    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 20px; border-radius: 10px; text-align: center; color: white;">
-        <h2>📚</h2>
-        <h3>Training Agent</h3>
-        <p>Get personalized training content</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    st.markdown("""
-    <div style="background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%); padding: 20px; border-radius: 10px; text-align: center; color: white;">
-        <h2>🤝</h2>
-        <h3>Mentor Agent</h3>
-        <p>Get expert guidance & answers</p>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col3:
-    st.markdown("""
-    <div style="background: linear-gradient(135deg, #4facfe 0%, #00f2fe 100%); padding: 20px; border-radius: 10px; text-align: center; color: white;">
-        <h2>📊</h2>
-        <h3>Assessment</h3>
-        <p>Evaluate your competency</p>
-    </div>
-    """, unsafe_allow_html=True)
+for col, card in zip((col1, col2, col3), (TRAINING_CARD, MENTOR_CARD, ASSESSMENT_CARD)):
+    with col:
+        st.markdown(card, unsafe_allow_html=True)
 
 st.markdown("---")
 st.success("👈 **Navigate using the sidebar menu on the left!** Streamlit automatically creates navigation links for all pages in the `pages/` directory.")
@@ -1,6 +1,6 @@
 # Login page (0_ prefix makes it appear first in Streamlit navigation)
 import streamlit as st
-import requests
+from services.http_client import LOGIN_URL, QUICK_TIMEOUT, BackendUnavailable, RequestTimeout, parse_json, post_json
 
 st.set_page_config(
     page_title="Login - AI Coach",
@@ -16,6 +16,7 @@ if "username" in st.session_state and st.session_state.username:
     if st.button("Logout"):
         st.session_state.username = None
         st.session_state.user_info = None
+        st.session_state.auth_token = None
         st.rerun()
     st.markdown("---")
     st.info("👈 Use the sidebar to navigate to other pages")
@@ -47,18 +48,20 @@ else:
         else:
             with st.spinner("Logging in..."):
                 try:
-                    response = requests.post(
-                        "http://127.0.0.1:8000/auth/login",
-                        json={"username": username, "password": password},
-                        timeout=5
+                    response = post_json(
+                        LOGIN_URL,
+                        {"username": username, "password": password},
+                        timeout=QUICK_TIMEOUT
                     )
                     
                     if response.status_code == 200:
-                        data = response.json()
+                        data = parse_json(response)
                         if data.get("success"):
                             # Store user info in session state
                             st.session_state.username = username
                             st.session_state.user_info = data.get("user", {})
+                            # Sent as a bearer token on user-scoped requests instead of the credentials
+                            st.session_state.auth_token = data.get("token")
                             st.success(f"✅ Welcome, **{username}**!")
                             st.balloons()
                             st.rerun()
@@ -66,10 +69,10 @@ else:
                             st.error(f"❌ {data.get('message', 'Login failed')}")
                     else:
                         st.error(f"❌ Login failed. Status code: {response.status_code}")
-                except requests.exceptions.ConnectionError:
+                except BackendUnavailable:
                     st.error("❌ **Backend not available!** Please ensure the backend server is running.")
                     st.info("💡 Start the backend with: `./run_backend.sh`")
-                except requests.exceptions.Timeout:
+                except RequestTimeout:
                     st.error("⏱️ **Request timed out!** Please try again.")
                 except Exception as e:
                     st.error(f"❌ **Error:** {str(e)}")
@@ -1,7 +1,182 @@
 #1_training
 import streamlit as st
-import requests
-from datetime import datetime
+import hashlib
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from services.http_client import (
+    DOWNLOAD_TIMEOUT, QUICK_TIMEOUT, SUBMIT_TIMEOUT, TRAINING_STREAM_TIMEOUT,
+    BACKEND_URL, DOC_JOBS_URL, PDF_MIME, PPT_MIME, PROGRESS_URL, TRAINING_STREAM_URL,
+    BackendUnavailable, RequestTimeout,
+    get_session, iter_sse, parse_json, post_in_background, post_json
+)
+
+
+# Document jobs: how often to poll the job state, and when to give up (seconds)
+DOC_JOB_POLL_INTERVAL = 0.5
+DOC_JOB_TIMEOUT = 120
+
+
+class DocumentError(Exception):
+    """Backend could not produce a valid document"""
+    def __init__(self, error: str, message: str = ""):
+        super().__init__(error)
+        self.error = error
+        self.message = message
+
+
+def _raise_document_error(response, label: str):
+    """Turn a JSON error body from the document endpoints into a DocumentError"""
+    try:
+        error_data = parse_json(response)
+    except ValueError:
+        raise DocumentError(f"Failed to generate {label}. Status: {response.status_code}")
+    # Endpoint errors carry error/message; HTTPExceptions (unknown job etc.) carry detail
+    raise DocumentError(error_data.get("error", error_data.get("detail", "Unknown error")), error_data.get("message", ""))
+
+
+@st.cache_data(ttl=3600, max_entries=32, show_spinner=False)
+def fetch_document(content_hash: str, _content: str, title: str, level: str, knowledge_base: str,
+                   format_type: str, mime: str, label: str) -> bytes:
+    """
+    Generate a PDF/PPT document for the training content via the backend.
+    
+    The backend builds the document as a background job; this submits it, polls the job state
+    and then downloads the finished file.
+    Cached by content hash + options (the leading underscore keeps the large content
+    out of Streamlit's argument hashing), so repeat downloads skip the backend entirely.
+    Raises DocumentError instead of returning, so failures are never cached.
+    """
+    session = get_session()
+    submit_response = post_json(
+        DOC_JOBS_URL,
+        {
+            "training_content": _content,
+            "title": title,
+            "level": level,
+            "knowledge_base": knowledge_base,
+            "format_type": format_type
+        },
+        timeout=SUBMIT_TIMEOUT
+    )
+    if submit_response.status_code != 200:
+        _raise_document_error(submit_response, label)
+    job_url = f"{DOC_JOBS_URL}/{parse_json(submit_response)['job_id']}"
+    
+    # Poll until the job finishes (generation normally takes a few seconds, never more than a minute)
+    deadline = time.monotonic() + DOC_JOB_TIMEOUT
+    while True:
+        status_response = session.get(job_url, timeout=QUICK_TIMEOUT)
+        if status_response.status_code != 200:
+            _raise_document_error(status_response, label)
+        status = parse_json(status_response)
+        if status["state"] == "complete":
+            break
+        if status["state"] == "failed":
+            raise DocumentError(status.get("error", "Unknown error"), status.get("message", ""))
+        if time.monotonic() > deadline:
+            raise RequestTimeout(f"{label} generation did not finish in {DOC_JOB_TIMEOUT} s")
+        time.sleep(DOC_JOB_POLL_INTERVAL)
+    
+    with session.get(f"{job_url}/file", stream=True, timeout=DOWNLOAD_TIMEOUT) as doc_response:
+        if doc_response.status_code != 200:
+            _raise_document_error(doc_response, label)
+        
+        content_type = doc_response.headers.get('content-type', '')
+        if not content_type.startswith(mime):
+            # Not the document we asked for - peek at the start of the body for an error message
+            head = next(doc_response.iter_content(chunk_size=512), b"")
+            error_text = head.decode('utf-8', errors='replace')
+            if 'error' in error_text.lower():
+                raise DocumentError(f"Error generating {label}: {error_text[:200]}")
+            raise DocumentError(f"Generated file is not a valid {label}. Please check backend logs.")
+        
+        # It's the expected binary file - copy it in 64 KB chunks straight off the socket
+        buf = BytesIO()
+        for chunk in doc_response.iter_content(chunk_size=65536):
+            buf.write(chunk)
+    
+    data = buf.getvalue()
+    if len(data) == 0:
+        raise DocumentError(f"Generated {label} file is empty. Please try again.")
+    
+    return data
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def split_sections(content_hash: str, _content: str) -> tuple:
+    """
+    Split the lesson markdown into (preamble, [(heading, body), ...]) at its `## ` headings.
+    
+    Cached by content hash, so reruns (every widget change) reuse the split instead of rescanning
+    the whole lesson. Headings inside fenced code blocks are ignored.
+    """
+    preamble, sections = [], []
+    current = preamble
+    in_fence = False
+    for line in _content.splitlines():
+        if line.lstrip().startswith("```"):
+            in_fence = not in_fence
+        if not in_fence and line.startswith("## "):
+            current = []
+            sections.append((line[3:].strip(), current))
+        else:
+            current.append(line)
+    return "\n".join(preamble), [(heading, "\n".join(body)) for heading, body in sections]
+
+
+@contextmanager
+def http_errors(action: str):
+    """Show the standard error messages for a failed backend call made inside the block"""
+    try:
+        yield
+    except DocumentError as e:
+        st.error(f"❌ Error: {e.error}")
+        if e.message:
+            st.info(f"💡 {e.message}")
+    except BackendUnavailable:
+        st.error("❌ **Backend not available!** Please ensure the backend server is running.")
+    except RequestTimeout:
+        st.error("⏱️ **Request timed out!** Please try again.")
+    except Exception as e:
+        st.error(f"❌ Error {action}: {str(e)}")
+
+
+def _download_doc(fmt: str, mime: str, label: str, extension: str):
+    """Fetch (or reuse the cached) document in the given format and render its download button"""
+    requested_key = f"{fmt}_requested"
+    # Only stays requested once the document is ready, so a failure shows its error once
+    st.session_state[requested_key] = False
+    
+    st.markdown("---")
+    with st.spinner(f"Generating {label} document..."), http_errors(f"generating {label}"):
+        content = st.session_state.training_content
+        # Document generation holds the same lock as training, so neither can be fired twice at once
+        st.session_state.in_flight = True
+        try:
+            data = fetch_document(
+                hashlib.blake2b(content.encode(), digest_size=16).hexdigest(),
+                content,
+                st.session_state.training_title,
+                st.session_state.training_level,
+                st.session_state.training_kb,
+                fmt,
+                mime,
+                label
+            )
+        finally:
+            st.session_state.in_flight = False
+        from datetime import datetime  # only needed once a document is ready
+        st.download_button(
+            label=f"⬇️ Download {label} File",
+            data=data,
+            file_name=f"{st.session_state.training_kb}_{st.session_state.training_level}_training_{datetime.now().strftime('%Y%m%d')}.{extension}",
+            mime=mime,
+            use_container_width=True,
+            key=f"{fmt}_download"
+        )
+        st.session_state[requested_key] = True
+
 
 # Title for the Training page
 st.title("📚 Training Agent")
@@ -29,11 +204,126 @@ with col2:
 
 st.markdown("---")
 
+# Button to start training (handled before rendering any previous content, which it replaces)
+if st.button("Start Training", disabled=st.session_state.get("in_flight", False)):
+    if st.session_state.get("in_flight"):
+        st.warning("⏳ A request is already in progress. Please wait for it to finish.")
+        st.stop()
+    st.session_state.in_flight = True
+    try:
+        with st.spinner("Fetching personalized training content..."):
+            # Prepare the payload to send to the backend
+            payload = {
+                "knowledge_base": knowledge_base,
+                "level": level.lower()
+            }
+
+            # Stream the lesson from the backend (Server-Sent Events) so the user can start reading immediately
+            try:
+                with post_json(
+                    TRAINING_STREAM_URL,
+                    payload,
+                    stream=True,
+                    timeout=TRAINING_STREAM_TIMEOUT
+                ) as response:
+                    if response.status_code == 200:
+                        placeholder = st.empty()
+                        chunks = []
+                        data = {}
+                        last_render = 0.0
+                        for event in iter_sse(response):
+                            if "token" in event:
+                                chunks.append(event["token"])
+                                # Throttle re-renders to ~10 Hz to avoid flooding the browser
+                                now = time.monotonic()
+                                if now - last_render >= 0.1:
+                                    placeholder.markdown("".join(chunks))
+                                    last_render = now
+                            elif event.get("done"):
+                                break
+                            else:
+                                data = event
+                        if chunks and "error" not in data:
+                            data = {"training_content": "".join(chunks)}
+                        placeholder.empty()
+                    else:
+                        data = None
+                        st.error(f"Failed to fetch training content. Status code: {response.status_code}")
+                        try:
+                            error_data = parse_json(response)
+                            if "error" in error_data:
+                                st.error(f"Error: {error_data['error']}")
+                                if "message" in error_data:
+                                    st.info(f"💡 {error_data['message']}")
+                        except:
+                            st.error("Please try again later.")
+            
+                if data is not None:
+                    # Check if response contains error or training content
+                    if "error" in data:
+                        st.error(f"❌ Error: {data.get('error', 'Unknown error')}")
+                        if "message" in data:
+                            st.info(f"💡 {data['message']}")
+                            st.markdown("""
+                            **To fix this:**
+                            1. Ensure you have PDF documents in the `./knowledge/` directory
+                            2. Run: `python services/rag.py` to create FAISS indexes
+                            """)
+                    elif "training_content" in data:
+                        # Store content in session state for download
+                        st.session_state.training_content = data["training_content"]
+                        st.session_state.training_title = f"{knowledge_base.upper()} - {level.title()} Training"
+                        st.session_state.training_level = level
+                        st.session_state.training_kb = knowledge_base
+                    
+                        # Clear any previous download requests
+                        st.session_state.pdf_requested = False
+                        st.session_state.ppt_requested = False
+                    
+                        # Track progress if user is logged in
+                        if "username" in st.session_state and st.session_state.username:
+                            progress_payload = {
+                                "username": st.session_state.username,
+                                "activity_type": "training",
+                                "activity_data": {
+                                    "level": level,
+                                    "knowledge_base": knowledge_base,
+                                    "duration": 0
+                                }
+                            }
+                            # Fire-and-forget: the worker thread swallows any failure, so nothing is shown to the user
+                            post_in_background(PROGRESS_URL, progress_payload)
+                    
+                        st.success("✅ Training content generated successfully!")
+                        st.rerun()  # Rerun to show the content and download buttons
+                    else:
+                        st.warning("Unexpected response format from server.")
+            except BackendUnavailable:
+                st.error(f"❌ **Backend not available!** Please ensure the backend server is running on {BACKEND_URL}")
+                st.info("💡 Start the backend with: `./run_backend.sh`")
+            except RequestTimeout:
+                st.error("⏱️ **Request timed out!** The LLM is taking longer than expected. Please try again or check if the backend is responsive.")
+            except Exception as e:
+                st.error(f"❌ **Error:** {str(e)}")
+
+    finally:
+        st.session_state.in_flight = False
+
 # Check if we have training content in session state
 if "training_content" in st.session_state and st.session_state.training_content:
     # Display existing training content
     st.subheader(f"📖 {st.session_state.training_level.title()} Level Training on {st.session_state.training_kb.upper()}")
-    st.markdown(st.session_state.training_content)
+    content = st.session_state.training_content
+    preamble, sections = split_sections(hashlib.blake2b(content.encode(), digest_size=16).hexdigest(), content)
+    if len(sections) > 1:
+        # One tab per lesson section keeps the page short; the split itself comes from the cache
+        if preamble.strip():
+            st.markdown(preamble)
+        for tab, (heading, body) in zip(st.tabs([heading for heading, _ in sections]), sections):
+            with tab:
+                st.markdown(body)
+    else:
+        st.markdown(content)
     
     # Download section
     st.markdown("---")
@@ -41,255 +331,27 @@ if "training_content" in st.session_state and st.session_state.training_content:
     col1, col2 = st.columns(2)
     
     with col1:
-        if st.button("📄 Download as PDF", use_container_width=True, key="download_pdf_btn"):
-            with st.spinner("Generating PDF document..."):
-                try:
-                    doc_response = requests.post(
-                        "http://127.0.0.1:8000/generate_document",
-                        json={
-                            "training_content": st.session_state.training_content,
-                            "title": st.session_state.training_title,
-                            "level": st.session_state.training_level,
-                            "knowledge_base": st.session_state.training_kb,
-                            "format_type": "pdf"
-                        },
-                        timeout=60
-                    )
-                    
-                    if doc_response.status_code == 200:
-                        # Check if response is actually a file (binary) or JSON error
-                        content_type = doc_response.headers.get('content-type', '')
-                        
-                        # If it's JSON, it's an error response
-                        if 'application/json' in content_type:
-                            try:
-                                error_data = doc_response.json()
-                                st.error(f"❌ Error: {error_data.get('error', 'Unknown error')}")
-                                if "message" in error_data:
-                                    st.info(f"💡 {error_data['message']}")
-                            except:
-                                st.error("Failed to generate PDF. Received JSON error response.")
-                        else:
-                            # It's a binary file
-                            if len(doc_response.content) == 0:
-                                st.error("❌ Generated PDF file is empty. Please try again.")
-                            else:
-                                # Validate PDF by checking magic bytes
-                                if doc_response.content[:4] == b'%PDF':
-                                    # Store in session state for download
-                                    st.session_state.pdf_data = doc_response.content
-                                    st.session_state.pdf_filename = f"{st.session_state.training_kb}_{st.session_state.training_level}_training_{datetime.now().strftime('%Y%m%d')}.pdf"
-                                    st.success("✅ PDF generated successfully! Click the download button below.")
-                                    st.rerun()
-                                else:
-                                    # Not a valid PDF, might be an error message
-                                    try:
-                                        error_text = doc_response.content.decode('utf-8')
-                                        if 'error' in error_text.lower():
-                                            st.error(f"❌ Error generating PDF: {error_text[:200]}")
-                                        else:
-                                            st.error("❌ Generated file is not a valid PDF. Please check backend logs.")
-                                    except:
-                                        st.error("❌ Generated file is not a valid PDF. Please check backend logs.")
-                    else:
-                        try:
-                            error_data = doc_response.json()
-                            st.error(f"❌ Error: {error_data.get('error', 'Unknown error')}")
-                            if "message" in error_data:
-                                st.info(f"💡 {error_data['message']}")
-                        except:
-                            st.error(f"Failed to generate PDF. Status: {doc_response.status_code}")
-                except requests.exceptions.ConnectionError:
-                    st.error("❌ **Backend not available!** Please ensure the backend server is running.")
-                except requests.exceptions.Timeout:
-                    st.error("⏱️ **Request timed out!** Please try again.")
-                except Exception as e:
-                    st.error(f"❌ Error generating PDF: {str(e)}")
+        if st.button("📄 Download as PDF", use_container_width=True, key="download_pdf_btn",
+                     disabled=st.session_state.get("in_flight", False)):
+            st.session_state.pdf_requested = True
     
     with col2:
-        if st.button("📊 Download as PowerPoint", use_container_width=True, key="download_ppt_btn"):
-            with st.spinner("Generating PowerPoint presentation..."):
-                try:
-                    doc_response = requests.post(
-                        "http://127.0.0.1:8000/generate_document",
-                        json={
-                            "training_content": st.session_state.training_content,
-                            "title": st.session_state.training_title,
-                            "level": st.session_state.training_level,
-                            "knowledge_base": st.session_state.training_kb,
-                            "format_type": "ppt"
-                        },
-                        timeout=60
-                    )
-                    
-                    if doc_response.status_code == 200:
-                        # Check if response is actually a file (binary) or JSON error
-                        content_type = doc_response.headers.get('content-type', '')
-                        
-                        # If it's JSON, it's an error response
-                        if 'application/json' in content_type:
-                            try:
-                                error_data = doc_response.json()
-                                st.error(f"❌ Error: {error_data.get('error', 'Unknown error')}")
-                                if "message" in error_data:
-                                    st.info(f"💡 {error_data['message']}")
-                            except:
-                                st.error("Failed to generate PowerPoint. Received JSON error response.")
-                        else:
-                            # It's a binary file
-                            if len(doc_response.content) == 0:
-                                st.error("❌ Generated PowerPoint file is empty. Please try again.")
-                            else:
-                                # Validate PPTX by checking magic bytes (ZIP format)
-                                if doc_response.content[:2] == b'PK':
-                                    # Store in session state for download
-                                    st.session_state.ppt_data = doc_response.content
-                                    st.session_state.ppt_filename = f"{st.session_state.training_kb}_{st.session_state.training_level}_training_{datetime.now().strftime('%Y%m%d')}.pptx"
-                                    st.success("✅ PowerPoint generated successfully! Click the download button below.")
-                                    st.rerun()
-                                else:
-                                    # Not a valid PPTX, might be an error message
-                                    try:
-                                        error_text = doc_response.content.decode('utf-8')
-                                        if 'error' in error_text.lower():
-                                            st.error(f"❌ Error generating PowerPoint: {error_text[:200]}")
-                                        else:
-                                            st.error("❌ Generated file is not a valid PowerPoint. Please check backend logs.")
-                                    except:
-                                        st.error("❌ Generated file is not a valid PowerPoint. Please check backend logs.")
-                    else:
-                        try:
-                            error_data = doc_response.json()
-                            st.error(f"❌ Error: {error_data.get('error', 'Unknown error')}")
-                            if "message" in error_data:
-                                st.info(f"💡 {error_data['message']}")
-                        except:
-                            st.error(f"Failed to generate PowerPoint. Status: {doc_response.status_code}")
-                except requests.exceptions.ConnectionError:
-                    st.error("❌ **Backend not available!** Please ensure the backend server is running.")
-                except requests.exceptions.Timeout:
-                    st.error("⏱️ **Request timed out!** Please try again.")
-                except Exception as e:
-                    st.error(f"❌ Error generating PowerPoint: {str(e)}")
+        if st.button("📊 Download as PowerPoint", use_container_width=True, key="download_ppt_btn",
+                     disabled=st.session_state.get("in_flight", False)):
+            st.session_state.ppt_requested = True
     
-    # Show download buttons if files are ready
-    if "pdf_data" in st.session_state:
-        st.markdown("---")
-        st.download_button(
-            label="⬇️ Download PDF File",
-            data=st.session_state.pdf_data,
-            file_name=st.session_state.pdf_filename,
-            mime="application/pdf",
-            use_container_width=True,
-            key="pdf_download"
-        )
+    # Show download buttons once a format has been requested (documents come from the cache after the first fetch)
+    if st.session_state.get("pdf_requested"):
+        _download_doc("pdf", PDF_MIME, "PDF", "pdf")
     
-    if "ppt_data" in st.session_state:
-        st.markdown("---")
-        st.download_button(
-            label="⬇️ Download PowerPoint File",
-            data=st.session_state.ppt_data,
-            file_name=st.session_state.ppt_filename,
-            mime="application/vnd.openxmlformats-officedocument.presentationml.presentation",
-            use_container_width=True,
-            key="ppt_download"
-        )
+    if st.session_state.get("ppt_requested"):
+        _download_doc("ppt", PPT_MIME, "PowerPoint", "pptx")
     
     st.markdown("---")
     if st.button("🔄 Generate New Training Content", use_container_width=True):
         # Clear session state to allow new generation
         if "training_content" in st.session_state:
             del st.session_state.training_content
-        if "pdf_data" in st.session_state:
-            del st.session_state.pdf_data
-        if "ppt_data" in st.session_state:
-            del st.session_state.ppt_data
+        st.session_state.pdf_requested = False
+        st.session_state.ppt_requested = False
         st.rerun()
-
-# Button to start training
-if st.button("Start Training"):
-    with st.spinner("Fetching personalized training content..."):
-        # Prepare the payload to send to the backend
-        payload = {
-            "knowledge_base": knowledge_base,
-            "level": level.lower()
-        }
-
-        # Send the request to the backend with timeout and error handling
-        try:
-            response = requests.post(
-                "http://127.0.0.1:8000/training", 
-                json=payload,
-                timeout=450  # Increased to 450 seconds (7.5 minutes) - LLM can take 300-400 seconds, with buffer
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                # Check if response contains error or training content
-                if "error" in data:
-                    st.error(f"❌ Error: {data.get('error', 'Unknown error')}")
-                    if "message" in data:
-                        st.info(f"💡 {data['message']}")
-                        st.markdown("""
-                        **To fix this:**
-                        1. Ensure you have PDF documents in the `./knowledge/` directory
-                        2. Run: `python services/rag.py` to create FAISS indexes
-                        """)
-                elif "training_content" in data:
-                    # Store content in session state for download
-                    st.session_state.training_content = data["training_content"]
-                    st.session_state.training_title = f"{knowledge_base.upper()} - {level.title()} Training"
-                    st.session_state.training_level = level
-                    st.session_state.training_kb = knowledge_base
-                    
-                    # Clear any previous download data
-                    if "pdf_data" in st.session_state:
-                        del st.session_state.pdf_data
-                    if "ppt_data" in st.session_state:
-                        del st.session_state.ppt_data
-                    
-                    # Track progress if user is logged in
-                    if "username" in st.session_state and st.session_state.username:
-                        try:
-                            progress_payload = {
-                                "username": st.session_state.username,
-                                "activity_type": "training",
-                                "activity_data": {
-                                    "level": level,
-                                    "knowledge_base": knowledge_base,
-                                    "duration": 0
-                                }
-                            }
-                            progress_response = requests.post(
-                                "http://127.0.0.1:8000/user/progress/update",
-                                json=progress_payload,
-                                timeout=5
-                            )
-                            # Don't show error to user, just log silently
-                        except Exception as e:
-                            # Don't show error to user, just log silently
-                            pass
-                    
-                    st.success("✅ Training content generated successfully!")
-                    st.rerun()  # Rerun to show the content and download buttons
-                else:
-                    st.warning("Unexpected response format from server.")
-            else:
-                st.error(f"Failed to fetch training content. Status code: {response.status_code}")
-                try:
-                    error_data = response.json()
-                    if "error" in error_data:
-                        st.error(f"Error: {error_data['error']}")
-                        if "message" in error_data:
-                            st.info(f"💡 {error_data['message']}")
-                except:
-                    st.error("Please try again later.")
-        except requests.exceptions.ConnectionError:
-            st.error("❌ **Backend not available!** Please ensure the backend server is running on http://127.0.0.1:8000")
-            st.info("💡 Start the backend with: `./run_backend.sh`")
-        except requests.exceptions.Timeout:
-            st.error("⏱️ **Request timed out!** The LLM is taking longer than expected. Please try again or check if the backend is responsive.")
-        except Exception as e:
-            st.error(f"❌ **Error:** {str(e)}")
-
-
@@ -1,7 +1,13 @@
 
 
+import time
 import streamlit as st
-import requests
+from services.http_client import (
+    MENTOR_STREAM_TIMEOUT, QUICK_TIMEOUT,
+    BACKEND_URL, MENTOR_STREAM_URL, PROGRESS_URL,
+    BackendUnavailable, RequestTimeout,
+    auth_headers, check_unauthorized, iter_sse, parse_json, post_json, post_msgpack
+)
 
 st.title("🤝 Mentor Agent")
 
@@ -9,62 +15,98 @@ st.title("🤝 Mentor Agent")
 user_query = st.text_area("Ask your technical question")
 
 # Button to send the query to the Mentor Agent
-if st.button("Ask Mentor"):
+if st.button("Ask Mentor", disabled=st.session_state.get("in_flight", False)):
     if user_query:
-        with st.spinner("Getting mentor guidance..."):
-            try:
-                response = requests.post("http://127.0.0.1:8000/mentor", json={"query": user_query, "context": "training"}, timeout=180)
+        if st.session_state.get("in_flight"):
+            st.warning("⏳ A request is already in progress. Please wait for it to finish.")
+            st.stop()
+        st.session_state.in_flight = True
+        try:
+            with st.spinner("Getting mentor guidance..."):
+                try:
+                    # Stream the answer (Server-Sent Events) so it renders as the LLM writes it
+                    with post_json(
+                        MENTOR_STREAM_URL,
+                        {"query": user_query, "context": "training"},
+                        stream=True,
+                        timeout=MENTOR_STREAM_TIMEOUT
+                    ) as response:
+                        if response.status_code == 200:
+                            st.subheader("👩‍💻 Mentor Response")
+                            placeholder = st.empty()
+                            chunks = []
+                            data = {}
+                            last_render = 0.0
+                            for event in iter_sse(response):
+                                if "token" in event:
+                                    chunks.append(event["token"])
+                                    # Throttle re-renders to ~10 Hz to avoid flooding the browser
+                                    now = time.monotonic()
+                                    if now - last_render >= 0.1:
+                                        placeholder.markdown("".join(chunks))
+                                        last_render = now
+                                elif event.get("done"):
+                                    break
+                                else:
+                                    data = event
+                            if chunks and "error" not in data:
+                                data = {"mentor_response": "".join(chunks)}
+                        else:
+                            data = None
+                            st.error(f"Failed to fetch mentor response. Status code: {response.status_code}")
+                            try:
+                                error_data = parse_json(response)
+                                if "error" in error_data:
+                                    st.error(f"Error: {error_data['error']}")
+                            except:
+                                st.error("Please try again later.")
                 
-                if response.status_code == 200:
-                    data = response.json()
-                    # Check if response contains error or mentor response
-                    if "error" in data:
-                        st.error(f"❌ Error: {data.get('error', 'Unknown error')}")
-                        if "message" in data:
-                            st.info(f"💡 {data['message']}")
-                    elif "mentor_response" in data:
-                        st.subheader("👩‍💻 Mentor Response")
-                        st.markdown(data["mentor_response"])
+                    if data is not None:
+                        # Check if response contains error or mentor response
+                        if "error" in data:
+                            placeholder.empty()
+                            st.error(f"❌ Error: {data.get('error', 'Unknown error')}")
+                            if "message" in data:
+                                st.info(f"💡 {data['message']}")
+                        elif "mentor_response" in data:
+                            placeholder.markdown(data["mentor_response"])
                         
-                        # Track progress if user is logged in
-                        if "username" in st.session_state and st.session_state.username:
-                            try:
-                                progress_payload = {
-                                    "username": st.session_state.username,
-                                    "activity_type": "mentor",
-                                    "activity_data": {
-                                        "query": user_query[:100],  # Store first 100 chars
-                                        "context": "training"
+                            # Track progress if user is logged in
+                            if "username" in st.session_state and st.session_state.username:
+                                try:
+                                    progress_payload = {
+                                        "username": st.session_state.username,
+                                        "activity_type": "mentor",
+                                        "activity_data": {
+                                            "query": user_query[:100],  # Store first 100 chars
+                                            "context": "training"
+                                        }
                                     }
-                                }
-                                progress_response = requests.post(
-                                    "http://127.0.0.1:8000/user/progress/update",
-                                    json=progress_payload,
-                                    timeout=5
-                                )
-                                if progress_response.status_code == 200:
-                                    st.success("✅ Query saved to your profile!")
-                            except Exception as e:
-                                # Don't show error to user, just log silently
-                                pass
-                    else:
-                        st.warning("Unexpected response format from server.")
-                else:
-                    st.error(f"Failed to fetch mentor response. Status code: {response.status_code}")
-                    try:
-                        error_data = response.json()
-                        if "error" in error_data:
-                            st.error(f"Error: {error_data['error']}")
-                    except:
-                        st.error("Please try again later.")
-            except requests.exceptions.ConnectionError:
-                st.error("❌ **Backend not available!** Please ensure the backend server is running on http://127.0.0.1:8000")
-                st.info("💡 Start the backend with: `./run_backend.sh`")
-            except requests.exceptions.Timeout:
-                st.error("⏱️ **Request timed out!** The LLM is taking longer than expected. Please try again or check if the backend is responsive.")
-            except Exception as e:
-                st.error(f"❌ **Error:** {str(e)}")
+                                    progress_response = post_msgpack(
+                                        PROGRESS_URL,
+                                        progress_payload,
+                                        headers=auth_headers(),
+                                        timeout=QUICK_TIMEOUT
+                                    )
+                                    check_unauthorized(progress_response)
+                                    if progress_response.status_code == 200:
+                                        st.success("✅ Query saved to your profile!")
+                                except Exception as e:
+                                    # Don't show error to user, just log silently
+                                    pass
+                        else:
+                            st.warning("Unexpected response format from server.")
+                except BackendUnavailable:
+                    st.error(f"❌ **Backend not available!** Please ensure the backend server is running on {BACKEND_URL}")
+                    st.info("💡 Start the backend with: `./run_backend.sh`")
+                except RequestTimeout:
+                    st.error("⏱️ **Request timed out!** The LLM is taking longer than expected. Please try again or check if the backend is responsive.")
+                except Exception as e:
+                    st.error(f"❌ **Error:** {str(e)}")
+        finally:
+            st.session_state.in_flight = False
     else:
         st.warning("Please enter your query before asking.")
 
 
+
@@ -1,6 +1,125 @@
 #3_assessment
+import random
+import time
 import streamlit as st
-import requests
+from services.http_client import (
+    EVALUATE_STREAM_TIMEOUT, QUESTIONS_TIMEOUT,
+    BACKEND_URL, EVALUATE_STREAM_URL, GENERATE_QUESTIONS_URL, PROGRESS_URL,
+    BackendUnavailable, RequestTimeout,
+    iter_sse, parse_json, post_in_background, post_json
+)
+from services.response_cache import ResponseCache, cache_key
+
+# Evaluation submit pacing (token bucket): sustained rate per minute, and how many may go back-to-back
+SUBMIT_RATE_PER_MIN = 4
+SUBMIT_BURST = 2.0
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    """On-disk evaluation cache shared by every session"""
+    return ResponseCache()
+
+
+def allow_submit(rate_per_min: float = SUBMIT_RATE_PER_MIN, burst: float = SUBMIT_BURST) -> bool:
+    """
+    Take a token from this session's submit bucket, refilled at `rate_per_min`.
+    
+    Kept in session_state, since module globals are re-created on every rerun.
+    """
+    now = time.monotonic()
+    bucket = st.session_state.setdefault("submit_bucket", {"tokens": burst, "last": now})
+    bucket["tokens"] = min(burst, bucket["tokens"] + (now - bucket["last"]) * rate_per_min / 60)
+    bucket["last"] = now
+    if bucket["tokens"] >= 1:
+        bucket["tokens"] -= 1
+        return True
+    return False
+
+
+class QuestionsError(Exception):
+    """Backend returned no questions for a topic"""
+    def __init__(self, error: str, message: str = ""):
+        super().__init__(error)
+        self.error = error
+        self.message = message
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_questions(topic: str) -> list:
+    """
+    Fetch the question bank for a (normalized) topic.
+    
+    Cached for an hour per topic; errors are raised rather than returned so they are never cached.
+    """
+    response = post_json(
+        GENERATE_QUESTIONS_URL,
+        {"topic": topic},
+        timeout=QUESTIONS_TIMEOUT
+    )
+    if response.status_code != 200:
+        try:
+            error_data = parse_json(response)
+        except ValueError:
+            error_data = {}
+        raise QuestionsError(
+            f"Failed to generate questions. Status code: {response.status_code}"
+            + (f" - {error_data['error']}" if "error" in error_data else ""),
+            error_data.get("message", "")
+        )
+    
+    questions_data = parse_json(response)
+    if "questions" not in questions_data:
+        raise QuestionsError(questions_data.get("error", "No questions returned for this topic."),
+                             questions_data.get("message", ""))
+    return questions_data["questions"]
+
+
+def stream_evaluation(answers: dict):
+    """
+    Stream the evaluation from the backend (Server-Sent Events), showing the LLM output as it is written.
+    
+    Returns the final evaluation dict, or None if the request failed (the error is already shown).
+    """
+    with post_json(
+        EVALUATE_STREAM_URL,
+        {"answers": answers},
+        stream=True,
+        timeout=EVALUATE_STREAM_TIMEOUT
+    ) as response:
+        if response.status_code != 200:
+            st.error(f"Failed to evaluate assessment. Status code: {response.status_code}")
+            try:
+                error_data = parse_json(response)
+                if "error" in error_data:
+                    st.error(f"Error: {error_data['error']}")
+                    if "message" in error_data:
+                        st.info(f"💡 {error_data['message']}")
+            except:
+                st.error("Please try again later.")
+            return None
+        
+        placeholder = st.empty()
+        chunks = []
+        data = {"error": "Evaluation ended without a result", "message": "Please submit your assessment again."}
+        last_render = 0.0
+        try:
+            for event in iter_sse(response):
+                if "token" in event:
+                    chunks.append(event["token"])
+                    # Throttle re-renders to ~10 Hz to avoid flooding the browser
+                    now = time.monotonic()
+                    if now - last_render >= 0.1:
+                        placeholder.code("".join(chunks), language="json")
+                        last_render = now
+                elif event.get("done"):
+                    break
+                else:
+                    data = event
+        finally:
+            # The raw draft is replaced by the formatted feedback below
+            placeholder.empty()
+        return data
+
 
 st.title("📊 Assessment & Feedback")
 
@@ -13,47 +132,33 @@ selected_topic = st.selectbox("Select a Topic", topics)
 if selected_topic:
     if st.button("Generate Questions"):
         with st.spinner("Generating questions..."):
-            payload = {
-                "topic": selected_topic
-            }
             # Request to backend to generate questions for the selected topic
             try:
-                response = requests.post(
-                    "http://127.0.0.1:8000/generate_questions", 
-                    json=payload,
-                    timeout=30  # Added: timeout for question generation
-                )
-                
-                if response.status_code == 200:
-                    questions_data = response.json()
-                    if "questions" in questions_data:
-                        st.session_state.questions = questions_data["questions"]
-                        st.session_state.answers = {}  # Reset answers if new questions are generated
-                        st.write("### Questions")
-                        for i, question in enumerate(st.session_state.questions):
-                            st.text_input(f"Question {i+1}: {question['question']}", key=f"answer_{i+1}")
-                    else:
-                        st.error("No questions returned for this topic.")
+                questions = fetch_questions(selected_topic.strip().lower())
+                if questions:
+                    # The cached bank is shared, so shuffle a copy for variety
+                    st.session_state.questions = random.sample(questions, len(questions))
+                    st.session_state.answers = {}  # Reset answers if new questions are generated
+                    st.write("### Questions")
+                    for i, question in enumerate(st.session_state.questions):
+                        st.text_input(f"Question {i+1}: {question['question']}", key=f"answer_{i+1}")
                 else:
-                    st.error(f"Failed to generate questions. Status code: {response.status_code}")
-                    try:
-                        error_data = response.json()
-                        if "error" in error_data:
-                            st.error(f"Error: {error_data['error']}")
-                            if "message" in error_data:
-                                st.info(f"💡 {error_data['message']}")
-                    except:
-                        st.error("Please try again later.")
-            except requests.exceptions.ConnectionError:
-                st.error("❌ **Backend not available!** Please ensure the backend server is running on http://127.0.0.1:8000")
+                    st.error("No questions returned for this topic.")
+            except QuestionsError as e:
+                st.error(e.error)
+                if e.message:
+                    st.info(f"💡 {e.message}")
+            except BackendUnavailable:
+                st.error(f"❌ **Backend not available!** Please ensure the backend server is running on {BACKEND_URL}")
                 st.info("💡 Start the backend with: `./run_backend.sh`")
-            except requests.exceptions.Timeout:
+            except RequestTimeout:
                 st.error("⏱️ **Request timed out!** Please try again.")
             except Exception as e:
                 st.error(f"❌ **Error:** {str(e)}")
                 
 # Step 3: User answers
 if 'questions' in st.session_state:
+    bypass_cache = st.sidebar.checkbox("Bypass response cache", help="Always re-evaluate, even for answers submitted before")
     if st.button("Submit Assessment"):
         answers = {}
         for i, question in enumerate(st.session_state.questions):
@@ -64,41 +169,47 @@ if 'questions' in st.session_state:
         # Step 4: Send answers to backend for evaluation
         with st.spinner("Evaluating your responses..."):
             try:
-                response = requests.post(
-                    "http://127.0.0.1:8000/evaluate_assessment", 
-                    json={"answers": answers},
-                    timeout=180  # Increased to 180 seconds (3 minutes) - LLM evaluation can take 120-150 seconds
-                )
-
-                if response.status_code == 200:
-                    data = response.json()
-                    if "feedback" in data and "score" in data:
+                # Identical questions + answers (after normalization) reuse the saved evaluation
+                key = cache_key({
+                    "questions": [question["question"] for question in st.session_state.questions],
+                    "answers": answers
+                })
+                data = None if bypass_cache else get_response_cache().get(key)
+                if data is not None:
+                    st.caption("♻️ Same answers as an earlier submission - showing the saved evaluation")
+                else:
+                    # Only fresh evaluations hit the LLM, so only they are paced
+                    if not allow_submit():
+                        st.warning("⏳ Please wait before resubmitting.")
+                        st.stop()
+                    # Feedback is streamed as the LLM writes it; the final event carries score/strengths/improvements
+                    data = stream_evaluation(answers)
+                    if data is not None and "error" not in data:
+                        get_response_cache().put(key, data)
+
+                if data is not None:
+                    if "error" in data:
+                        st.error(f"❌ Error: {data['error']}")
+                        if "message" in data:
+                            st.info(f"💡 {data['message']}")
+                    elif "feedback" in data and "score" in data:
                         st.subheader("📝 Feedback")
                         st.markdown(data["feedback"])
                         st.metric("Competency Score", data["score"])
                         
                         # Track progress if user is logged in
                         if "username" in st.session_state and st.session_state.username:
-                            try:
-                                progress_payload = {
-                                    "username": st.session_state.username,
-                                    "activity_type": "assessment",
-                                    "activity_data": {
-                                        "topic": selected_topic,
-                                        "score": data.get("score", 0),
-                                        "num_questions": len(st.session_state.questions)
-                                    }
+                            progress_payload = {
+                                "username": st.session_state.username,
+                                "activity_type": "assessment",
+                                "activity_data": {
+                                    "topic": selected_topic,
+                                    "score": data.get("score", 0),
+                                    "num_questions": len(st.session_state.questions)
                                 }
-                                progress_response = requests.post(
-                                    "http://127.0.0.1:8000/user/progress/update",
-                                    json=progress_payload,
-                                    timeout=5
-                                )
-                                if progress_response.status_code == 200:
-                                    st.success("✅ Assessment progress saved!")
-                            except Exception as e:
-                                # Don't show error to user, just log silently
-                                pass
+                            }
+                            # Fire-and-forget on the shared worker pool: the feedback renders without waiting on it
+                            post_in_background(PROGRESS_URL, progress_payload)
                         
                         # Show additional details if available
                         if "strengths" in data and data["strengths"]:
@@ -111,20 +222,10 @@ if 'questions' in st.session_state:
                                     st.write(f"• {improvement}")
                     else:
                         st.warning("Unexpected response format from server.")
-                else:
-                    st.error(f"Failed to evaluate assessment. Status code: {response.status_code}")
-                    try:
-                        error_data = response.json()
-                        if "error" in error_data:
-                            st.error(f"Error: {error_data['error']}")
-                            if "message" in error_data:
-                                st.info(f"💡 {error_data['message']}")
-                    except:
-                        st.error("Please try again later.")
-            except requests.exceptions.ConnectionError:
-                st.error("❌ **Backend not available!** Please ensure the backend server is running on http://127.0.0.1:8000")
+            except BackendUnavailable:
+                st.error(f"❌ **Backend not available!** Please ensure the backend server is running on {BACKEND_URL}")
                 st.info("💡 Start the backend with: `./run_backend.sh`")
-            except requests.exceptions.Timeout:
+            except RequestTimeout:
                 st.error("⏱️ **Request timed out!** The LLM is taking longer than expected. Please try again.")
             except Exception as e:
                 st.error(f"❌ **Error:** {str(e)}")
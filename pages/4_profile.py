@@ -1,6 +1,6 @@
 # Profile page with dashboard and recommendations
 import streamlit as st
-import requests
+from services.http_client import QUICK_TIMEOUT, USER_URL, auth_headers, get_session, parse_json, redirect_to_login
 from datetime import datetime
 
 st.set_page_config(
@@ -17,32 +17,46 @@ if "username" not in st.session_state or not st.session_state.username:
 
 username = st.session_state.username
 
-st.title(f"👤 Profile: {username}")
 
-# Fetch user data
-try:
-    # Get profile
-    profile_response = requests.get(
-        f"http://127.0.0.1:8000/user/{username}/profile",
-        timeout=5
-    )
-    
-    # Get statistics
-    stats_response = requests.get(
-        f"http://127.0.0.1:8000/user/{username}/statistics",
-        timeout=5
-    )
-    
-    # Get recommendations
-    rec_response = requests.get(
-        f"http://127.0.0.1:8000/user/{username}/recommendations",
-        timeout=5
-    )
+class SessionExpired(Exception):
+    """Backend rejected the auth token (raised, not returned, so it is never cached)"""
+
+
+class DashboardError(Exception):
+    """Backend could not return the dashboard (raised, not returned, so a transient failure is never cached)"""
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_dashboard(username: str, _headers: dict):
+    """
+    Fetch profile, statistics and recommendations for a user (one /dashboard round trip).
     
-    profile = profile_response.json().get("profile", {}) if profile_response.status_code == 200 else {}
-    stats = stats_response.json().get("statistics", {}) if stats_response.status_code == 200 else {}
-    recommendations = rec_response.json().get("recommendations", []) if rec_response.status_code == 200 else []
+    Cached per username for 30 s so widget reruns don't hit the backend; the Refresh button clears it.
+    """
+    response = get_session().get(f"{USER_URL}/{username}/dashboard", headers=_headers, timeout=QUICK_TIMEOUT)
+    if response.status_code == 401:
+        raise SessionExpired()
+    if response.status_code != 200:
+        raise DashboardError(f"Backend returned status {response.status_code}")
     
+    data = parse_json(response)
+    if not data.get("success", True):
+        raise DashboardError(data.get("message", "Unknown error"))
+    return data.get("profile", {}), data.get("statistics", {}), data.get("recommendations", [])
+
+
+title_col, refresh_col = st.columns([5, 1])
+with title_col:
+    st.title(f"👤 Profile: {username}")
+with refresh_col:
+    if st.button("🔄 Refresh", use_container_width=True):
+        fetch_dashboard.clear()
+
+# Fetch user data
+try:
+    profile, stats, recommendations = fetch_dashboard(username, auth_headers())
+except SessionExpired:
+    redirect_to_login()
 except Exception as e:
     st.error(f"❌ Error loading profile data: {str(e)}")
     profile = {}
@@ -53,37 +67,15 @@ except Exception as e:
 st.markdown("---")
 st.subheader("📊 Learning Dashboard")
 
-# Key Metrics
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.metric(
-        "Training Sessions",
-        stats.get("total_training_sessions", 0),
-        help="Total number of training sessions completed"
-    )
-
-with col2:
-    st.metric(
-        "Assessments",
-        stats.get("total_assessments", 0),
-        help="Total number of assessments completed"
-    )
-
-with col3:
-    st.metric(
-        "Mentor Queries",
-        stats.get("total_mentor_queries", 0),
-        help="Total number of questions asked to mentor"
-    )
-
-with col4:
-    training_time = stats.get("total_training_time_minutes", 0)
-    st.metric(
-        "Training Time",
-        f"{training_time:.1f} min",
-        help="Total time spent in training sessions"
-    )
+# Key Metrics (label, value, help)
+metrics = (
+    ("Training Sessions", stats.get("total_training_sessions", 0), "Total number of training sessions completed"),
+    ("Assessments", stats.get("total_assessments", 0), "Total number of assessments completed"),
+    ("Mentor Queries", stats.get("total_mentor_queries", 0), "Total number of questions asked to mentor"),
+    ("Training Time", f"{stats.get('total_training_time_minutes', 0):.1f} min", "Total time spent in training sessions"),
+)
+for col, (label, value, help_text) in zip(st.columns(len(metrics)), metrics):
+    col.metric(label, value, help=help_text)
 
 # Progress Section
 st.markdown("---")
@@ -123,17 +115,18 @@ st.markdown("---")
 st.subheader("💡 Personalized Recommendations")
 
 if recommendations:
-    # Sort by priority
+    # Sort by priority: rank each recommendation once (the index keeps ties in their original order),
+    # leaving the cached list untouched
     priority_order = {"high": 0, "medium": 1, "low": 2}
-    recommendations.sort(key=lambda x: priority_order.get(x.get("priority", "low"), 2))
+    priority_icons = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+    ranked = sorted(
+        (priority_order.get(rec.get("priority", "low"), 2), i, rec)
+        for i, rec in enumerate(recommendations)
+    )
     
-    for i, rec in enumerate(recommendations, 1):
+    for _, _, rec in ranked:
         priority = rec.get("priority", "low")
-        priority_color = {
-            "high": "🔴",
-            "medium": "🟡",
-            "low": "🟢"
-        }.get(priority, "⚪")
+        priority_color = priority_icons.get(priority, "⚪")
         
         with st.expander(f"{priority_color} **{rec.get('title', 'Recommendation')}**", expanded=(priority == "high")):
             st.markdown(f"**Description:** {rec.get('description', '')}")
@@ -173,6 +166,8 @@ st.markdown("---")
 if st.button("🚪 Logout", type="secondary"):
     st.session_state.username = None
     st.session_state.user_info = None
+    st.session_state.auth_token = None
+    fetch_dashboard.clear()
     st.success("Logged out successfully!")
     st.rerun()
 
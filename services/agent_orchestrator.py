@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 from services.training_agent import TrainingAgent
 from services.mentor_agent import MentorAgent
 from services.assessment_agent import AssessmentAgent
@@ -10,13 +11,18 @@ class AgentOrchestrator:
     
     def __init__(self):
         logger.info("Initializing AgentOrchestrator")
-        logger.debug("Creating agent instances...")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Creating agent instances...")
         self.training_agent = TrainingAgent()
-        logger.debug("TrainingAgent created")
+        if debug:
+            logger.debug("TrainingAgent created")
         self.mentor_agent = MentorAgent()
-        logger.debug("MentorAgent created")
+        if debug:
+            logger.debug("MentorAgent created")
         self.assessment_agent = AssessmentAgent()
-        logger.debug("AssessmentAgent created")
+        if debug:
+            logger.debug("AssessmentAgent created")
         logger.info("AgentOrchestrator initialization complete")
     
     def route_to_training_agent(self, level: str, knowledge_base: str = "mml"):
@@ -30,12 +36,28 @@ class AgentOrchestrator:
         Returns:
             Response from training agent
         """
-        logger.info(f"Orchestrator: Routing to TrainingAgent")
-        logger.debug(f"  Parameters: level={level}, knowledge_base={knowledge_base}")
+        logger.info("Orchestrator: Routing to TrainingAgent")
+        logger.debug("  Parameters: level=%s, knowledge_base=%s", level, knowledge_base)
         response = self.training_agent.handle_request(level, knowledge_base)
-        logger.debug(f"TrainingAgent response received, keys: {list(response.keys()) if isinstance(response, dict) else 'N/A'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("TrainingAgent response received, keys: %s", list(response.keys()) if isinstance(response, dict) else 'N/A')
         return response
     
+    def stream_training_agent(self, level: str, knowledge_base: str = "mml"):
+        """
+        Route a streaming training request to training agent
+        
+        Args:
+            level: Training level ('beginner', 'intermediate', 'advanced', 'architecture')
+            knowledge_base: Knowledge base to use ('mml' or 'alarm_handling')
+        
+        Returns:
+            Generator of events from training agent
+        """
+        logger.info("Orchestrator: Streaming from TrainingAgent")
+        logger.debug("  Parameters: level=%s, knowledge_base=%s", level, knowledge_base)
+        return self.training_agent.stream_request(level, knowledge_base)
+    
     def route_to_mentor_agent(self, query: str, context: str = "training"):
         """
         Route mentor request to mentor agent
@@ -47,12 +69,28 @@ class AgentOrchestrator:
         Returns:
             Response from mentor agent
         """
-        logger.info(f"Orchestrator: Routing to MentorAgent")
-        logger.debug(f"  Query length: {len(query)}, context: {context}")
+        logger.info("Orchestrator: Routing to MentorAgent")
+        logger.debug("  Query length: %d, context: %s", len(query), context)
         response = self.mentor_agent.handle_request(query, context)
-        logger.debug(f"MentorAgent response received, keys: {list(response.keys()) if isinstance(response, dict) else 'N/A'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("MentorAgent response received, keys: %s", list(response.keys()) if isinstance(response, dict) else 'N/A')
         return response
     
+    def stream_mentor_agent(self, query: str, context: str = "training"):
+        """
+        Route a streaming mentor request to mentor agent
+        
+        Args:
+            query: User's technical question
+            context: Context for the query
+        
+        Returns:
+            Generator of events from mentor agent
+        """
+        logger.info("Orchestrator: Streaming from MentorAgent")
+        logger.debug("  Query length: %d, context: %s", len(query), context)
+        return self.mentor_agent.stream_request(query, context)
+    
     def route_to_assessment_agent(self, scenario: str):
         """
         Route assessment request to assessment agent
@@ -63,9 +101,31 @@ class AgentOrchestrator:
         Returns:
             Response from assessment agent
         """
-        logger.info(f"Orchestrator: Routing to AssessmentAgent")
-        logger.debug(f"  Scenario length: {len(scenario)}")
+        logger.info("Orchestrator: Routing to AssessmentAgent")
+        logger.debug("  Scenario length: %d", len(scenario))
         response = self.assessment_agent.handle_request(scenario)
-        logger.debug(f"AssessmentAgent response received, keys: {list(response.keys()) if isinstance(response, dict) else 'N/A'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("AssessmentAgent response received, keys: %s", list(response.keys()) if isinstance(response, dict) else 'N/A')
         return response
 
+    
+    def stream_assessment_agent(self, scenario: str):
+        """
+        Route a streaming assessment request to assessment agent
+        
+        Args:
+            scenario: User's approach description
+        
+        Returns:
+            Generator of events from assessment agent
+        """
+        logger.info("Orchestrator: Streaming from AssessmentAgent")
+        logger.debug("  Scenario length: %d", len(scenario))
+        return self.assessment_agent.stream_request(scenario)
+
+
+@lru_cache(maxsize=1)
+def get_orchestrator() -> AgentOrchestrator:
+    """Process-wide orchestrator: the agents (and their LLM/retrieval handles) are built once, on first use"""
+    logger.info("Initializing AgentOrchestrator (lazy initialization)")
+    return AgentOrchestrator()
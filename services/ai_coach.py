@@ -1,76 +1,257 @@
 
 # ai_coach_dashboard.py - COMPLETE LLM-POWERED TELECOM TRAINING COACH
+import hashlib
+import io
 import os
 import json
 from datetime import datetime
 import re
-from typing import Dict, List
+import sys
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_community.vectorstores import FAISS
 from langchain_core.tools import tool
 from langchain_core.output_parsers import StrOutputParser
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
-from rich.prompt import Prompt
-from rich.text import Text
 from pathlib import Path
 from pydantic import BaseModel, Field
-import httpx
-from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 from langchain_core.documents import Document 
-from sklearn.cluster import KMeans
+from langchain_core.embeddings import Embeddings
 import numpy as np
+import atexit
 import logging
-import sys
+import threading
 import time
 from dotenv import load_dotenv
 
+# Run as a script (python services/ai_coach.py): put the repo root on sys.path so the services package imports
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.diagrams import reference_diagram
+from services.log_config import setup_logging
+from services.semantic_cache import get_semantic_cache
+
+# orjson is optional: faster (de)serialization of the multi-MB group cache files
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# h2 is optional: HTTP/2 multiplexing to the LLM endpoint (httpx[http2]); HTTP/1.1 keep-alive otherwise
+try:
+    import h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# pyarrow is optional: the group cache is stored as one columnar Parquet file instead of nested JSON
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
 # Configure logging
-os.makedirs('logs', exist_ok=True)
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(f'logs/ai_coach_{datetime.now().strftime("%Y%m%d")}.log')
-    ]
-)
+setup_logging("ai_coach")
 logger = logging.getLogger(__name__)
 
 # Configuration
 FAISS_ROOT = "./services/faiss_indexes/"
+# Lessons for the same knowledge base + level and identical content are reused instead of regenerated.
+# Exact match only: BGE truncates the documents to 512 tokens, so near-duplicate matching would keep
+# serving a stale lesson after the knowledge base changes past its first group
+LESSON_CACHE_PATH = "data/lesson_cache.pkl"
+LESSON_CACHE_TTL = 7 * 24 * 3600  # seconds; regenerate lessons weekly even if the content is unchanged
+DOUBT_CACHE_PATH = "data/doubt_cache.pkl"
+DOUBT_CACHE_THRESHOLD = 0.97  # cosine similarity; lower values match "what is X" to "what is not X" or to other parameters of X
+DOUBT_CACHE_TTL = 3600  # seconds
+# Cross-encoder reranking of the context sent with lessons/doubts (RERANK_DOCS=0 sends every chunk)
+RERANK_DOCS = os.getenv("RERANK_DOCS", "1") != "0"
+RERANK_MODEL = "BAAI/bge-reranker-base"
+LESSON_RERANK_TOP_K = 24
+DOUBT_RERANK_TOP_K = 8
+LESSON_CONCURRENCY = 4  # lessons generated at once by generate_all_lessons
+STREAM_REFRESH_PER_SECOND = 8  # live panel redraws while a lesson / doubt answer streams in
+HNSW_EF_SEARCH = 64  # search breadth when an index has been converted to HNSW (see rag.py --hnsw)
+USE_GPU_FAISS = os.getenv("FAISS_GPU") == "1"  # move flat indexes to GPU 0 (needs faiss-gpu); for batched multi-user search
 
-# Try new langchain-huggingface first, fallback to deprecated for compatibility
-try:
-    from langchain_huggingface import HuggingFaceEmbeddings  # New API
-    USE_NEW_EMBEDDINGS = True
-except ImportError:
-    # Fallback to deprecated version if new package not available
-    from langchain_community.embeddings import HuggingFaceBgeEmbeddings  # Fallback
-    USE_NEW_EMBEDDINGS = False
-
-# Initialize embeddings with new or deprecated API
-if USE_NEW_EMBEDDINGS:
-    # New langchain-huggingface API
-    EMBEDDINGS = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        model_kwargs={"device": "cpu", "trust_remote_code": True},
-        encode_kwargs={"normalize_embeddings": True},  # True enabling Semantic search
-    )
-else:
-    # Deprecated langchain-community API (fallback)
-    EMBEDDINGS = HuggingFaceBgeEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        model_kwargs={"device": "cpu", "trust_remote_code": True},
-        encode_kwargs={"normalize_embeddings": True},  # True enabling Semantic search
-    )
+# Embeddings backend: "hf" (FP32 BGE via sentence-transformers, default),
+# "int8" (Intel INT8-quantized BGE; needs optimum[neural-compressor,ipex]),
+# "onnx" (BGE exported to ONNX Runtime with dynamic INT8 quantization; needs optimum[onnxruntime]) or
+# "gguf" (Q8_0/Q4_K_M BGE through llama.cpp; needs llama-cpp-python)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "hf").lower()
+INT8_EMBEDDINGS_MODEL = "Intel/bge-base-en-v1.5-rag-int8-static"
+ONNX_EMBEDDINGS_DIR = os.getenv("ONNX_EMBEDDINGS_DIR", "./models/bge-base-en-v1.5-onnx-int8")
+GGUF_EMBEDDINGS_MODEL = os.getenv("GGUF_EMBEDDINGS_MODEL", "./models/bge-base-en-v1.5-q8_0.gguf")
+EMBED_BATCH_SIZE = 64
+
+
+class NormalizedEmbeddings(Embeddings):
+    """L2-normalizes another embeddings model's vectors (llama.cpp has no normalize option), embedding documents in batches"""
+    
+    def __init__(self, model: Embeddings, batch_size: int = EMBED_BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+    
+    @staticmethod
+    def _normalize(vectors) -> List[List[float]]:
+        array = np.array(vectors, dtype="float32")
+        # Row-wise squared norms in one pass, then scale in place by the reciprocal square root
+        inv_norms = 1.0 / np.sqrt(np.maximum(np.einsum("ij,ij->i", array, array), 1e-24))
+        array *= inv_norms[:, None]
+        return array.tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.model.embed_documents(texts[start:start + self.batch_size]))
+        return self._normalize(vectors) if vectors else []
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self._normalize([self.model.embed_query(text)])[0]
+
+class OnnxBgeEmbeddings(Embeddings):
+    """BGE on ONNX Runtime, INT8 dynamically quantized (exported and quantized once into `model_dir`); CLS pooling, unnormalized"""
+    
+    def __init__(self, model_dir: str = ONNX_EMBEDDINGS_DIR, model_name: str = "BAAI/bge-base-en-v1.5"):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+        
+        if not Path(model_dir, "model_quantized.onnx").exists():
+            logger.info(f"Exporting {model_name} to ONNX and quantizing to INT8 (one-time) → {model_dir}")
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            model.save_pretrained(model_dir)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(model_dir)
+            quantizer = ORTQuantizer.from_pretrained(model)
+            quantizer.quantize(
+                save_dir=model_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False),
+            )
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_dir, file_name="model_quantized.onnx", provider="CPUExecutionProvider"
+        )
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors="np")
+        outputs = self.model(**inputs)
+        return np.asarray(outputs.last_hidden_state)[:, 0].tolist()  # CLS token, as BGE is trained
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def _build_embeddings():
+    """Create the BGE embeddings for the configured backend (always normalized, for cosine search)"""
+    if EMBEDDINGS_BACKEND == "int8":
+        try:
+            from langchain_community.embeddings import QuantizedBgeEmbeddings
+            logger.info(f"Using INT8 quantized embeddings: {INT8_EMBEDDINGS_MODEL}")
+            return QuantizedBgeEmbeddings(
+                model_name=INT8_EMBEDDINGS_MODEL,
+                encode_kwargs={"normalize_embeddings": True},
+                query_instruction="Represent this sentence for searching relevant passages: ",
+            )
+        except ImportError as e:
+            logger.warning(f"INT8 embeddings unavailable ({e}), falling back to FP32 BGE")
+    elif EMBEDDINGS_BACKEND == "onnx":
+        try:
+            logger.info(f"Using ONNX Runtime INT8 embeddings: {ONNX_EMBEDDINGS_DIR}")
+            return NormalizedEmbeddings(OnnxBgeEmbeddings())
+        except ImportError as e:
+            logger.warning(f"ONNX embeddings unavailable ({e}), falling back to FP32 BGE")
+    elif EMBEDDINGS_BACKEND == "gguf":
+        try:
+            from langchain_community.embeddings import LlamaCppEmbeddings
+            logger.info(f"Using GGUF embeddings via llama.cpp: {GGUF_EMBEDDINGS_MODEL}")
+            return NormalizedEmbeddings(LlamaCppEmbeddings(model_path=GGUF_EMBEDDINGS_MODEL, n_batch=512))
+        except ImportError as e:
+            logger.warning(f"GGUF embeddings unavailable ({e}), falling back to FP32 BGE")
+    
+    # Try new langchain-huggingface first, fallback to deprecated for compatibility
+    try:
+        from langchain_huggingface import HuggingFaceEmbeddings  # New API
+        return HuggingFaceEmbeddings(
+            model_name="BAAI/bge-base-en-v1.5",
+            model_kwargs={"device": "cpu", "trust_remote_code": True},
+            encode_kwargs={"normalize_embeddings": True},  # True enabling Semantic search
+        )
+    except ImportError:
+        # Deprecated langchain-community API (fallback)
+        from langchain_community.embeddings import HuggingFaceBgeEmbeddings
+        return HuggingFaceBgeEmbeddings(
+            model_name="BAAI/bge-base-en-v1.5",
+            model_kwargs={"device": "cpu", "trust_remote_code": True},
+            encode_kwargs={"normalize_embeddings": True},  # True enabling Semantic search
+        )
+
+_EMBEDDINGS = None
+_EMBEDDINGS_LOCK = threading.Lock()
+
+def get_embeddings() -> Embeddings:
+    """Process-wide embeddings, built on first use (loading the model takes seconds and ~400 MB)"""
+    global _EMBEDDINGS
+    if _EMBEDDINGS is None:
+        with _EMBEDDINGS_LOCK:
+            if _EMBEDDINGS is None:
+                _EMBEDDINGS = _build_embeddings()
+    return _EMBEDDINGS
+
+class EmbeddingsProxy(Embeddings):
+    """Stand-in for the embeddings that only loads the model when something is actually embedded"""
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_embeddings().embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        return get_embeddings().embed_query(text)
+
+EMBEDDINGS = EmbeddingsProxy()
+
+# Shared HTTP clients for the LLM endpoint, keyed by (ssl_verify, timeout_seconds)
+_HTTPX_CLIENTS: Dict[tuple, "httpx.Client"] = {}
+_HTTPX_LOCK = threading.Lock()
+
+def _close_http_clients():
+    for client in _HTTPX_CLIENTS.values():
+        client.close()
+
+atexit.register(_close_http_clients)
+
+def llm_timeout(read_seconds: float) -> "httpx.Timeout":
+    """Reads wait up to `read_seconds` for the next chunk; connecting / writing / getting a pooled connection fail fast"""
+    import httpx
+    return httpx.Timeout(read_seconds, connect=5.0, write=30.0, pool=5.0)
+
+def get_http_client(ssl_verify: bool, timeout_seconds: float) -> "httpx.Client":
+    """Pooled keep-alive client for the LLM endpoint, shared by every ChatOpenAI instance with the same settings"""
+    import httpx
+    key = (ssl_verify, timeout_seconds)
+    with _HTTPX_LOCK:
+        if key not in _HTTPX_CLIENTS:
+            _HTTPX_CLIENTS[key] = httpx.Client(
+                verify=ssl_verify,
+                timeout=llm_timeout(timeout_seconds),
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=30),
+            )
+        return _HTTPX_CLIENTS[key]
 
 def get_eli_chat_model(temperature: float = 0.0, model_name: str = None):
+    # Imported here so that importing this module (e.g. just for the retrieval tool) doesn't load the OpenAI client
+    from langchain_openai import ChatOpenAI
+    
     logger.info("="*80)
     logger.info("INITIALIZING LLM CONNECTION")
     
@@ -141,27 +322,24 @@ def get_eli_chat_model(temperature: float = 0.0, model_name: str = None):
         # For remote, allow None (unlimited) or use env var if set
         max_tokens = int(max_tokens_env) if max_tokens_env.isdigit() else None
     
+    # Local servers (Ollama / llama.cpp): keep the model loaded and reuse the KV cache for a shared prompt prefix
+    extra_body = {"cache_prompt": True, "keep_alive": "30m"} if llm_mode == "local" else None
+    
     logger.debug(f"Connection parameters: model={model_name}, temperature={temperature}, max_tokens={max_tokens}, max_retries=2, ssl_verify={ssl_verify}")
     
     # Create httpx client with SSL verification setting
-    # Set reasonable timeout: 450 seconds (7.5 minutes) for local, 600 seconds (10 minutes) for remote
-    # This prevents indefinite hangs while allowing enough time for LLM responses
-    # Note: Ollama can take 300-400 seconds for complex training content generation
-    timeout_seconds = 450 if llm_mode == "local" else 600
+    # Read timeout - responses are streamed, so this bounds the wait for the next chunk (mostly the first one):
+    # 450 seconds (7.5 minutes) for local, where Ollama on CPU can spend minutes on a long prompt before the first token,
+    # 120 seconds for the remote gateway, so a hung connection fails (and is retried) instead of stalling the session
+    timeout_seconds = 450 if llm_mode == "local" else 120
     http_client_kwargs = {}
     if not ssl_verify:
         if llm_mode == "local":
-            logger.debug(f"Creating HTTP client for local Ollama (no SSL verification, timeout={timeout_seconds}s)")
+            logger.debug(f"Using HTTP client for local Ollama (no SSL verification, timeout={timeout_seconds}s)")
         else:
             logger.warning("SSL certificate verification is DISABLED - use only in trusted/internal networks!")
-        # Create httpx client with SSL verification disabled and reasonable timeout
-        http_client = httpx.Client(verify=False, timeout=timeout_seconds)
-        # Pass http_client to ChatOpenAI - it will use it for the underlying OpenAI client
-        http_client_kwargs['http_client'] = http_client
-    else:
-        # Even with SSL verification, we need a timeout
-        http_client = httpx.Client(verify=True, timeout=timeout_seconds)
-        http_client_kwargs['http_client'] = http_client
+    # Pass http_client to ChatOpenAI - it will use it for the underlying OpenAI client
+    http_client_kwargs['http_client'] = get_http_client(ssl_verify, timeout_seconds)
     
     # Create an instance of ChatOpenAI using latest LangChain OpenAI API (v0.2.0+)
     try:
@@ -171,13 +349,15 @@ def get_eli_chat_model(temperature: float = 0.0, model_name: str = None):
         logger.info(f"🔧 [CONFIG] Temperature: {temperature}")
         logger.info(f"🔧 [CONFIG] Max tokens: {max_tokens} ({'limited' if max_tokens else 'unlimited'})")
         logger.info(f"🔧 [CONFIG] Max retries: 2")
-        logger.info(f"🔧 [CONFIG] HTTP timeout: {timeout_seconds}s ({timeout_seconds/60:.1f} minutes)")
+        logger.info(f"🔧 [CONFIG] HTTP read timeout: {timeout_seconds}s ({timeout_seconds/60:.1f} minutes), connect/pool 5s")
         llm = ChatOpenAI(
             model=model_name,
             temperature=temperature,
             max_tokens=max_tokens,  # Limit tokens for faster responses
-            timeout=timeout_seconds,  # Set timeout to match http_client
+            timeout=llm_timeout(timeout_seconds),  # Per-request timeout overrides the client's, so pass the same one
             max_retries=2,
+            streaming=True,  # Token-by-token responses, so the console can render as the LLM writes
+            extra_body=extra_body,
             api_key=api_key,
             base_url=base_url,
             **http_client_kwargs,  # Includes http_client with proper timeout
@@ -195,33 +375,45 @@ def get_eli_chat_model(temperature: float = 0.0, model_name: str = None):
 
 # Lazy initialization of LLM to avoid import-time failures
 _LLM = None
+_LLM_LOCK = threading.Lock()
 
 def get_llm():
     """Get or create the global LLM instance"""
     global _LLM
     if _LLM is None:
-        try:
-            _LLM = get_eli_chat_model()
-            logger.info("Global LLM instance created successfully")
-        except Exception as e:
-            logger.error(f"CRITICAL: Failed to create global LLM instance: {str(e)}")
-            raise
+        with _LLM_LOCK:
+            if _LLM is None:
+                try:
+                    _LLM = get_eli_chat_model()
+                    logger.info("Global LLM instance created successfully")
+                except Exception as e:
+                    logger.error(f"CRITICAL: Failed to create global LLM instance: {str(e)}")
+                    raise
     return _LLM
 
 # LLM Proxy for lazy initialization
 class LLMProxy:
     """Proxy class that lazily initializes the LLM when accessed"""
     _llm_instance = None
+    # Bound straight onto the proxy once the LLM exists, so calls skip __getattr__ and the None check
+    _HOT_METHODS = ("invoke", "stream", "batch", "ainvoke", "astream", "abatch", "bind")
     
     def _get_llm(self):
         """Get the actual LLM instance"""
         if self._llm_instance is None:
-            self._llm_instance = get_llm()
+            llm = get_llm()
+            self._llm_instance = llm
+            for name in self._HOT_METHODS:
+                if hasattr(llm, name):
+                    setattr(self, name, getattr(llm, name))
         return self._llm_instance
     
     def __getattr__(self, name):
-        """Delegate all attribute access to the actual LLM"""
-        return getattr(self._get_llm(), name)
+        """Delegate all attribute access to the actual LLM (methods are cached on the proxy after first use)"""
+        value = getattr(self._get_llm(), name)
+        if callable(value) and not name.startswith("__"):
+            setattr(self, name, value)
+        return value
     
     def __or__(self, other):
         """Support LangChain pipe operator: prompt | LLM"""
@@ -234,73 +426,172 @@ class LLMProxy:
     def __call__(self, *args, **kwargs):
         """Make the proxy callable - ChatOpenAI uses invoke(), not direct call"""
         # ChatOpenAI objects are not directly callable, they use invoke()
-        return self._get_llm().invoke(*args, **kwargs)
+        # (after the first call, self.invoke is the LLM's own bound method - no proxy hop)
+        return self.invoke(*args, **kwargs)
     
     def invoke(self, *args, **kwargs):
-        """Explicit invoke method"""
+        """Explicit invoke method - only runs until the LLM exists, then the instance attribute shadows it"""
         return self._get_llm().invoke(*args, **kwargs)
 
 # Create LLM proxy instance
 LLM = LLMProxy()
-console = Console()
+
+class ConsoleProxy:
+    """Proxy that creates the rich Console on first use (the CLI needs it; the API server mostly doesn't)"""
+    _console = None
+    
+    def __getattr__(self, name):
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return getattr(self._console, name)
+
+console = ConsoleProxy()
 
 class TrainingContentInput(BaseModel):
     knowledge_base: str = Field(..., description="'alarm_handling' or 'mml'")
     level: str = Field(..., description="'beginner', 'intermediate', 'advanced', 'architecture'")
 
+# Content keywords for chunk classification (substring matches, like the original keyword lists)
+_IMG_RE = re.compile(r"diagram|figure|fig|image|chart|graph|flow")
+_TBL_RE = re.compile(r"table|\||---|parameter|value")
+
 def classify_chunk_type(chunk: Document) -> str:
-    """✅ Classify chunk as Text/Image/Table"""
+    """✅ Classify chunk as Text/Image/Table (memoized on the chunk's metadata)"""
     metadata = chunk.metadata
-    content = chunk.page_content.lower()
+    cached = metadata.get('_classified_type')
+    if cached:
+        return cached
     
     if metadata.get('category') == 'Image' or metadata.get('element_type') == 'Image':
-        return 'Image'
-    if metadata.get('category') == 'Table' or metadata.get('element_type') == 'Table':
-        return 'Table'
-    if metadata.get('has_images'):
-        return 'Image'
-    
-    image_keywords = ['diagram', 'figure', 'fig', 'image', 'chart', 'graph', 'flow']
-    table_keywords = ['table', '|', '---', 'parameter', 'value']
-    
-    if sum(1 for kw in image_keywords if kw in content) >= 1:
-        return 'Image'
-    if sum(1 for kw in table_keywords if kw in content) >= 2:
-        return 'Table'
+        chunk_type = 'Image'
+    elif metadata.get('category') == 'Table' or metadata.get('element_type') == 'Table':
+        chunk_type = 'Table'
+    elif metadata.get('has_images'):
+        chunk_type = 'Image'
+    else:
+        content = chunk.page_content.lower()
+        if _IMG_RE.search(content):
+            chunk_type = 'Image'
+        elif len(set(_TBL_RE.findall(content))) >= 2:  # at least two different table keywords
+            chunk_type = 'Table'
+        else:
+            chunk_type = 'Text'
     
-    return 'Text'
+    metadata['_classified_type'] = chunk_type
+    return chunk_type
+
+# Loaded vector stores, one per index directory (deserializing the docstore pickle is slow)
+_VS_CACHE: Dict[str, "FAISS"] = {}
+_VS_LOCKS: Dict[str, threading.Lock] = {}  # one per index, so different indexes load in parallel
+_VS_LOCK = threading.Lock()  # guards _VS_LOCKS
+_GPU_RESOURCES = None
+
+def _to_gpu(vectorstore: "FAISS") -> "FAISS":
+    """Move a vector store's index onto GPU 0, keeping the CPU index if that isn't possible"""
+    global _GPU_RESOURCES
+    import faiss
+    try:
+        if _GPU_RESOURCES is None:
+            _GPU_RESOURCES = faiss.StandardGpuResources()
+        vectorstore.index = faiss.index_cpu_to_gpu(_GPU_RESOURCES, 0, vectorstore.index)
+        logger.info("FAISS index moved to GPU")
+    except (AttributeError, RuntimeError) as e:
+        # AttributeError: faiss-cpu build; RuntimeError: no GPU or unsupported index type (e.g. HNSW)
+        logger.warning(f"Keeping FAISS index on CPU: {e}")
+    return vectorstore
+
+def load_faiss_index(index_path) -> "FAISS":
+    """Load a saved FAISS index once per process, setting the HNSW search breadth if it is a graph index"""
+    # Imported here so that importing this module (e.g. for the Pydantic models) doesn't load FAISS
+    from langchain_community.vectorstores import FAISS
+    key = str(Path(index_path).resolve())
+    # Double-checked: cached lookups skip the lock; only first loads of the same index serialize
+    vectorstore = _VS_CACHE.get(key)
+    if vectorstore is not None:
+        return vectorstore
+    with _VS_LOCK:
+        index_lock = _VS_LOCKS.setdefault(key, threading.Lock())
+    with index_lock:
+        vectorstore = _VS_CACHE.get(key)
+        if vectorstore is None:
+            vectorstore = FAISS.load_local(str(index_path), EMBEDDINGS, allow_dangerous_deserialization=True)  # lazy proxy: loading never needs the model
+            if hasattr(vectorstore.index, "hnsw"):
+                vectorstore.index.hnsw.efSearch = HNSW_EF_SEARCH
+            elif USE_GPU_FAISS:
+                vectorstore = _to_gpu(vectorstore)
+            _VS_CACHE[key] = vectorstore
+    return vectorstore
+
+def batched_search(vectorstore: "FAISS", queries: np.ndarray, k: int = 4) -> List[List[tuple]]:
+    """Search many query embeddings in one index call; returns [(Document, distance), ...] per query"""
+    distances, ids = vectorstore.index.search(np.ascontiguousarray(queries, dtype="float32"), k)
+    results = []
+    for row_distances, row_ids in zip(distances, ids):
+        results.append([
+            (vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(i)]), float(d))
+            for d, i in zip(row_distances, row_ids) if i >= 0
+        ])
+    return results
+
+# Knowledge base name (and lowercase alias) -> index directory, filled by _discover_indexes()
+_INDEX_PATHS: Dict[str, Path] = {}
+_INDEX_ROOTS = (FAISS_ROOT, "./faiss_indexes")
+
+def _discover_indexes():
+    """Map every index directory under the index roots (first root wins on name clashes)"""
+    for root in reversed(_INDEX_ROOTS):
+        root_path = Path(root)
+        if not root_path.is_dir():
+            continue
+        for path in root_path.iterdir():
+            if (path / "index.faiss").exists():
+                _INDEX_PATHS[path.name] = path
+                _INDEX_PATHS[path.name.lower()] = path
+
+def find_index_path(knowledge_base: str) -> Optional[Path]:
+    """Index directory for a knowledge base; rescans once on a miss in case it was built after startup"""
+    if knowledge_base not in _INDEX_PATHS and knowledge_base.lower() not in _INDEX_PATHS:
+        _discover_indexes()
+    index_path = _INDEX_PATHS.get(knowledge_base) or _INDEX_PATHS.get(knowledge_base.lower())
+    if index_path:
+        return index_path
+    # Legacy location: an index directory in the working directory
+    legacy_path = Path(f"./{knowledge_base}")
+    if (legacy_path / "index.faiss").exists():
+        return legacy_path
+    return None
+
+_discover_indexes()
+
+def knowledge_fingerprint(knowledge_bases) -> str:
+    """Short hash of the knowledge bases' index files (size + mtime) - changes whenever an index is rebuilt"""
+    digest = hashlib.sha256()
+    for knowledge_base in knowledge_bases:
+        index_path = find_index_path(knowledge_base)
+        digest.update(knowledge_base.encode())
+        if index_path is None:
+            continue
+        for name in ("index.faiss", "index.pkl"):
+            file_path = index_path / name
+            if file_path.exists():
+                stat = file_path.stat()
+                digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+def get_vectorstore(knowledge_base: str) -> Optional["FAISS"]:
+    """Process-wide vector store of a knowledge base (loaded from disk on first use), or None if it has no index"""
+    index_path = find_index_path(knowledge_base)
+    return load_faiss_index(index_path) if index_path else None
 
 def retrieve_all_chunks_raw(knowledge_base: str) -> List[Document]:
     """✅ Retrieve 100% ALL chunks from FAISS"""
-    index_path = None
-    possible_paths = [
-        Path(f"{FAISS_ROOT}/{knowledge_base}"),
-        Path(f"{FAISS_ROOT}/{knowledge_base.lower()}"),
-        Path(f"./{knowledge_base}"),
-        Path(f"./faiss_indexes/{knowledge_base}")
-    ]
-    
-    for path in possible_paths:
-        if path.exists() and list(path.glob("index.faiss")):
-            index_path = path
-            print(f"✅ Found FAISS index: {path}")
-            break
-    
-    if not index_path:
-        return []
-    
     try:
-        vectorstore = FAISS.load_local(str(index_path), EMBEDDINGS, allow_dangerous_deserialization=True)
-        index_size = vectorstore.index.ntotal
-        
-        if index_size > 0:
-            try:
-                all_docs_with_scores = vectorstore.similarity_search_with_score(" ", k=index_size)
-                all_docs = [doc for doc, score in all_docs_with_scores]
-            except:
-                all_docs = vectorstore.similarity_search(" ", k=index_size)
-        else:
-            all_docs = []
+        vectorstore = get_vectorstore(knowledge_base)
+        if vectorstore is None:
+            return []
+        # Every stored document, in index order - no query embedding or distance scan needed
+        all_docs = [vectorstore.docstore.search(doc_id) for doc_id in vectorstore.index_to_docstore_id.values()]
     except Exception as e:
         print(f"❌ FAISS error: {e}")
         return []
@@ -311,27 +602,18 @@ def retrieve_all_chunks_raw(knowledge_base: str) -> List[Document]:
     return filtered_docs
 
 # 🔥 LLM-POWERED GROUPING (NEW)
-def llm_group_chunks(chunks: List[Document], knowledge_base: str) -> Dict[str, List[Document]]:
-    """🔥 ELI LLM creates intelligent groups from ALL chunks (NO limit!)"""
-    print(f"🤖 LLM analyzing **ALL {len(chunks)}** chunks for grouping...")
-    
-    # ✅ ALL CHUNKS (no [:60] limit)
-    chunk_samples = []
-    for i, chunk in enumerate(chunks):  # ALL chunks!
-        chunk_type = classify_chunk_type(chunk)
-        source = Path(chunk.metadata.get('source', 'unknown.pdf')).name
-        preview = chunk.page_content[:250].strip()  # Shorter previews for more chunks
-        chunk_samples.append(f"CHUNK {i+1} [{chunk_type.upper()}] {source}: {preview}")
-    
-    # ✅ ALL samples (chunked if too long)
-    sample_text = "\n---\n".join(chunk_samples)
-    
-    # Chunk if exceeds token limit
-    if len(sample_text) > 8000:
-        sample_text = sample_text[:8000] + "\n...[TRUNCATED - ALL CHUNKS ANALYZED]"
-        print(f"⚠️ Truncated to 8000 chars ({len(chunk_samples)} chunks analyzed)")
-    
-    prompt = ChatPromptTemplate.from_template("""
+# Don't try to parse the streamed grouping JSON before this many tokens have arrived
+GROUPING_MIN_TOKENS = 50
+# Output cap for a grouping call: the JSON answer (group names + chunk indices) fits well within this,
+# and a model that keeps writing after it is cut off instead of running to the global limit
+GROUPING_OUTPUT_MAX_TOKENS = 2048
+# Previews over this many tokens are grouped window by window (map), then similar group names are merged (reduce);
+# leaves room for the prompt itself and the JSON answer in an 8k context
+GROUPING_MAX_TOKENS = 6000
+GROUPING_CONCURRENCY = 4
+GROUP_MERGE_THRESHOLD = 0.85  # cosine similarity of group names
+
+GROUPING_PROMPT = ChatPromptTemplate.from_template("""
 You are **Ericsson Telecom Training Architect**. Organize **ALL {len_chunks}** {knowledge_base} chunks into **5-12 meaningful business topics**.
 
 **ALL CHUNKS** (Text/Images/Tables - analyze complete list):
@@ -353,38 +635,164 @@ You are **Ericsson Telecom Training Architect**. Organize **ALL {len_chunks}** {
 
 **IMPORTANT**: Use ALL chunk numbers (1-{len_chunks}). Images/Tables first.
 """)
+
+def _json_loads(text: str):
+    return orjson.loads(text) if ORJSON_AVAILABLE else json.loads(text)
+
+@lru_cache(maxsize=1)
+def _get_tokenizer():
+    """cl100k_base tokenizer (a close enough proxy for Qwen/Llama token counts), or None without tiktoken"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # not installed, or the encoding file can't be fetched
+        logger.warning(f"tiktoken unavailable ({e}), estimating tokens as characters / 4")
+        return None
+
+def _count_tokens(text: str) -> int:
+    tokenizer = _get_tokenizer()
+    return len(tokenizer.encode(text)) if tokenizer else len(text) // 4 + 1
+
+def _chunk_sample(i: int, chunk: Document, chunk_type: str) -> str:
+    source = Path(chunk.metadata.get('source', 'unknown.pdf')).name
+    preview = chunk.page_content[:250].strip()  # Shorter previews for more chunks
+    return f"CHUNK {i+1} [{chunk_type.upper()}] {source}: {preview}"
+
+def _chunk_samples(chunks: List[Document], types: List[str]) -> str:
+    """Numbered (1-based) previews of chunks for the grouping prompt"""
+    return "\n---\n".join(_chunk_sample(i, chunk, chunk_type)
+                           for i, (chunk, chunk_type) in enumerate(zip(chunks, types)))
+
+def _pack_windows(chunks: List[Document], types: List[str]) -> List[tuple]:
+    """Split chunks into consecutive (chunks, types) windows whose previews fit GROUPING_MAX_TOKENS"""
+    windows = []
+    start = used = 0
+    for i, (chunk, chunk_type) in enumerate(zip(chunks, types)):
+        tokens = _count_tokens(_chunk_sample(i - start, chunk, chunk_type)) + 2  # + "---" separator
+        if used + tokens > GROUPING_MAX_TOKENS and i > start:
+            windows.append((chunks[start:i], types[start:i]))
+            start, used = i, 0
+        used += tokens
+    windows.append((chunks[start:], types[start:]))
+    return windows
+
+def _indices_to_groups(groups_json: dict, chunks: List[Document]) -> Dict[str, List[Document]]:
+    """Map the LLM's 1-based chunk_indices back to the chunks"""
+    grouped = {}
+    for group in groups_json.get("groups", []):
+        name = group.get("name", "Unnamed Group")
+        indices = group.get("chunk_indices", [])
+        group_chunks = [chunks[i-1] for i in indices if 0 <= i-1 < len(chunks)]
+        if group_chunks:
+            grouped.setdefault(name, []).extend(group_chunks)
+    return grouped
+
+def _stream_groups_json(chain, prompt_vars: dict) -> dict:
+    """Stream, and stop as soon as the output is a complete JSON object (skips anything the model adds after it)"""
+    parts = []
+    # closing() ends the generation (and its HTTP response) right away on the early return,
+    # instead of whenever the abandoned generator is garbage-collected
+    with closing(chain.stream(prompt_vars)) as tokens:
+        for token in tokens:
+            parts.append(token)
+            if len(parts) < GROUPING_MIN_TOKENS or "}" not in token:
+                continue
+            response = "".join(parts).strip()
+            if response.endswith("}") and response.count("{") == response.count("}"):
+                try:
+                    return _json_loads(response)
+                except ValueError:
+                    pass
+    return _json_loads("".join(parts).strip())
+
+def _merge_similar_groups(groups: List[tuple]) -> Dict[str, List[Document]]:
+    """Union groups whose names embed within GROUP_MERGE_THRESHOLD; the first name of each cluster is kept"""
+    names = [name for name, _ in groups]
+    vectors = np.asarray(get_embeddings().embed_documents(names), dtype="float32")
+    similar = vectors @ vectors.T >= GROUP_MERGE_THRESHOLD  # embeddings are normalized
     
-    chain = prompt | LLM | StrOutputParser()
+    parent = list(range(len(groups)))
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for i, j in zip(*np.nonzero(np.triu(similar, k=1))):
+        root_i, root_j = find(i), find(j)
+        parent[max(root_i, root_j)] = min(root_i, root_j)  # lowest index stays the root
+    
+    merged: Dict[int, List[Document]] = {}
+    for i, (_, group_chunks) in enumerate(groups):
+        merged.setdefault(find(i), []).extend(group_chunks)
+    return {names[root]: group_chunks for root, group_chunks in merged.items()}
+
+def _map_reduce_groups(chain, windows: List[tuple], knowledge_base: str) -> Dict[str, List[Document]]:
+    """Group each window of chunks in parallel, then merge groups with similar names"""
+    print(f"🧩 Grouping {sum(len(w_chunks) for w_chunks, _ in windows)} chunks in {len(windows)} windows")
+    
+    # batch() runs the windows concurrently on LangChain's thread pool (safe inside or outside an event loop)
+    responses = chain.batch(
+        [{"knowledge_base": knowledge_base, "sample_text": _chunk_samples(w_chunks, w_types), "len_chunks": len(w_chunks)}
+         for w_chunks, w_types in windows],
+        config={"max_concurrency": GROUPING_CONCURRENCY},
+        return_exceptions=True
+    )
+    
+    groups = []
+    for (w_chunks, w_types), response in zip(windows, responses):
+        try:
+            if isinstance(response, Exception):
+                raise response
+            window_groups = _indices_to_groups(_json_loads(response.strip()), w_chunks)
+        except Exception as e:
+            print(f"⚠️ Window grouping failed: {e} → Fallback for {len(w_chunks)} chunks")
+            window_groups = create_fallback_groups(w_chunks, w_types)
+        groups.extend(window_groups.items())
+    
+    if len(groups) < 2:
+        return dict(groups)
+    return _merge_similar_groups(groups)
+
+def llm_group_chunks(chunks: List[Document], knowledge_base: str,
+                     types: Optional[List[str]] = None) -> Dict[str, List[Document]]:
+    """🔥 ELI LLM creates intelligent groups from ALL chunks (NO limit!)"""
+    print(f"🤖 LLM analyzing **ALL {len(chunks)}** chunks for grouping...")
+    
+    # ✅ ALL CHUNKS (no [:60] limit)
+    if types is None:
+        types = [classify_chunk_type(c) for c in chunks]
+    windows = _pack_windows(chunks, types)
+    
+    # The real chat model (not the proxy, which LangChain would wrap as a plain callable), so that
+    # chain.stream() yields tokens and _stream_groups_json can stop early
+    chain = GROUPING_PROMPT | LLM._get_llm().bind(max_tokens=GROUPING_OUTPUT_MAX_TOKENS) | StrOutputParser()
     
     try:
-        response = chain.invoke({
-            "knowledge_base": knowledge_base, 
-            "sample_text": sample_text,
-            "len_chunks": len(chunks)
-        })
-        groups_json = json.loads(response.strip())
-        
-        grouped = {}
-        for group in groups_json.get("groups", []):
-            name = group.get("name", "Unnamed Group")
-            indices = group.get("chunk_indices", [])
-            group_chunks = [chunks[i-1] for i in indices if 0 <= i-1 < len(chunks)]
-            if group_chunks:
-                grouped[name] = group_chunks
+        if len(windows) > 1:
+            # Too long for one prompt: map-reduce instead of truncating, so every chunk is seen
+            grouped = _map_reduce_groups(chain, windows, knowledge_base)
+        else:
+            grouped = _indices_to_groups(_stream_groups_json(chain, {
+                "knowledge_base": knowledge_base, 
+                "sample_text": _chunk_samples(chunks, types),
+                "len_chunks": len(chunks)
+            }), chunks)
         
         print(f"✅ LLM grouped **ALL {len(chunks)}** chunks into {len(grouped)} groups")
         return grouped
         
     except Exception as e:
         print(f"⚠️ LLM failed: {e} → Fallback")
-        return create_fallback_groups(chunks)
+        return create_fallback_groups(chunks, types)
 
-def create_fallback_groups(chunks: List[Document]) -> Dict[str, List[Document]]:
+def create_fallback_groups(chunks: List[Document], types: Optional[List[str]] = None) -> Dict[str, List[Document]]:
     """Fallback if LLM fails"""
+    if types is None:
+        types = [classify_chunk_type(c) for c in chunks]
     grouped = {}
-    image_chunks = [c for c in chunks if classify_chunk_type(c) == 'Image']
-    table_chunks = [c for c in chunks if classify_chunk_type(c) == 'Table']
-    text_chunks = [c for c in chunks if classify_chunk_type(c) == 'Text']
+    image_chunks = [c for c, t in zip(chunks, types) if t == 'Image']
+    table_chunks = [c for c, t in zip(chunks, types) if t == 'Table']
+    text_chunks = [c for c, t in zip(chunks, types) if t == 'Text']
     
     if image_chunks: grouped["🖼️ Diagrams & Flowcharts"] = image_chunks
     if table_chunks: grouped["📊 Reference Tables & Codes"] = table_chunks
@@ -392,10 +800,101 @@ def create_fallback_groups(chunks: List[Document]) -> Dict[str, List[Document]]:
     
     return grouped
 
-@tool(args_schema=TrainingContentInput)
-def retrieve_training_content(knowledge_base: str, level: str) -> str:
-    """✅ LLM GROUPS ALL CHUNKS → SAVES ROOT DIR → RETURNS SAME GROUPS FOR LLM"""
+def _load_group_cache(knowledge_base: str, total_chunks: int) -> Optional[Dict[str, List[Document]]]:
+    """LLM groups saved by an earlier run (Parquet if available, else JSON), or None if missing/stale"""
+    parquet_file = Path(f"./{knowledge_base}_llm_groups.parquet")
+    json_file = Path(f"./{knowledge_base}_llm_groups.json")
+    try:
+        if PARQUET_AVAILABLE and parquet_file.exists():
+            table = pq.read_table(parquet_file)
+            if int(table.schema.metadata[b"total_chunks"]) != total_chunks:
+                return None
+            grouped = {}
+            columns = table.to_pydict()
+            for name, content, metadata in zip(columns["group_name"], columns["page_content"], columns["metadata"]):
+                grouped.setdefault(name, []).append(Document(page_content=content, metadata=json.loads(metadata)))
+            print(f"✅ LOADED CACHE: {len(grouped)} LLM groups")
+            return grouped
+        
+        if json_file.exists():
+            if ORJSON_AVAILABLE:
+                cached = orjson.loads(json_file.read_bytes())
+            else:
+                cached = json.loads(json_file.read_text(encoding='utf-8'))
+            if cached["total_chunks"] == total_chunks:
+                print(f"✅ LOADED CACHE: {len(cached['groups'])} LLM groups")
+                return {
+                    g["name"]: [Document(**chunk_data) for chunk_data in g["chunks"]]
+                    for g in cached["groups"]
+                }
+    except Exception as e:
+        print(f"⚠️ Cache invalid: {e}")
+    return None
+
+def _save_group_cache(knowledge_base: str, level: str, total_chunks: int,
+                      grouped_chunks: Dict[str, List[Document]]) -> Path:
+    """Save LLM groups for later runs; returns the file written"""
+    if PARQUET_AVAILABLE:
+        # One row per chunk (columnar), group order preserved; metadata kept whole as JSON text
+        rows = [(name, chunk) for name, chunks in grouped_chunks.items() for chunk in chunks]
+        table = pa.Table.from_pydict(
+            {
+                "group_name": [name for name, _ in rows],
+                "page_content": [chunk.page_content for _, chunk in rows],
+                "metadata": [json.dumps(chunk.metadata, ensure_ascii=False) for _, chunk in rows],
+            },
+            metadata={"knowledge_base": knowledge_base, "level": level, "total_chunks": str(total_chunks),
+                      "timestamp": datetime.now().isoformat()}
+        )
+        cache_file = Path(f"./{knowledge_base}_llm_groups.parquet")
+        pq.write_table(table, cache_file, compression="zstd")
+        return cache_file
+    
+    cache_data = {
+        "knowledge_base": knowledge_base,
+        "level": level,
+        "total_chunks": total_chunks,
+        "groups": [
+            {
+                "name": name,
+                "chunk_count": len(chunks),
+                "chunks": [chunk.dict() for chunk in chunks]
+            }
+            for name, chunks in grouped_chunks.items()
+        ],
+        "timestamp": datetime.now().isoformat()
+    }
     
+    cache_file = Path(f"./{knowledge_base}_llm_groups.json")
+    if ORJSON_AVAILABLE:
+        cache_file.write_bytes(orjson.dumps(cache_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        cache_file.write_text(json.dumps(cache_data, ensure_ascii=False, indent=2), encoding='utf-8')
+    return cache_file
+
+# knowledge_base -> (groups, total_chunks, type_counts); the indexes don't change while the process runs
+_GROUPS_CACHE: Dict[str, tuple] = {}
+_GROUPS_LOCKS: Dict[str, threading.Lock] = {}  # one per knowledge base, so concurrent first requests group it once
+_GROUPS_LOCK = threading.Lock()  # guards _GROUPS_LOCKS
+
+def _training_groups(knowledge_base: str, level: str):
+    """LLM-grouped chunks of a knowledge base as (groups, total_chunks, type_counts), or an error message string"""
+    # Double-checked: cached lookups skip the lock; only first requests for the same knowledge base serialize
+    cached = _GROUPS_CACHE.get(knowledge_base)
+    if cached is not None:
+        return cached
+    with _GROUPS_LOCK:
+        kb_lock = _GROUPS_LOCKS.setdefault(knowledge_base, threading.Lock())
+    with kb_lock:
+        cached = _GROUPS_CACHE.get(knowledge_base)
+        if cached is None:
+            cached = _group_knowledge_base(knowledge_base, level)
+            if not isinstance(cached, str):
+                _GROUPS_CACHE[knowledge_base] = cached
+    return cached
+
+def _group_knowledge_base(knowledge_base: str, level: str):
+    """Retrieve, classify and LLM-group every chunk of a knowledge base (caller holds its lock)"""
     print(f"\n🔥 LLM-POWERED: {knowledge_base} ({level})")
     
     all_chunks = retrieve_all_chunks_raw(knowledge_base)
@@ -406,43 +905,18 @@ def retrieve_training_content(knowledge_base: str, level: str) -> str:
     total_chunks = len(all_chunks)
     print(f"✅ Retrieved {total_chunks} chunks (Text+Images+Tables)")
     
-    cache_file = Path(f"./{knowledge_base}_llm_groups.json")
-    grouped_chunks = None
+    # Classify every chunk once; grouping and the breakdown reuse these
+    types = [classify_chunk_type(c) for c in all_chunks]
+    type_counts = Counter(types)
     
-    if cache_file.exists():
-        try:
-            cached = json.loads(cache_file.read_text(encoding='utf-8'))
-            if cached["total_chunks"] == total_chunks:
-                print(f"✅ LOADED CACHE: {len(cached['groups'])} LLM groups")
-                grouped_chunks = {
-                    g["name"]: [Document(**chunk_data) for chunk_data in g["chunks"]]
-                    for g in cached["groups"]
-                }
-        except Exception as e:
-            print(f"⚠️ Cache invalid: {e}")
+    grouped_chunks = _load_group_cache(knowledge_base, total_chunks)
     
     if not grouped_chunks:
         print("🤖 LLM creating intelligent groups...")
-        grouped_chunks = llm_group_chunks(all_chunks, knowledge_base)
-        
-        cache_data = {
-            "knowledge_base": knowledge_base,
-            "level": level,
-            "total_chunks": total_chunks,
-            "groups": [
-                {
-                    "name": name,
-                    "chunk_count": len(chunks),
-                    "chunks": [chunk.dict() for chunk in chunks]
-                }
-                for name, chunks in grouped_chunks.items()
-            ],
-            "timestamp": datetime.now().isoformat()
-        }
+        grouped_chunks = llm_group_chunks(all_chunks, knowledge_base, types)
+        cache_file = _save_group_cache(knowledge_base, level, total_chunks, grouped_chunks)
         
-        cache_file.write_text(json.dumps(cache_data, ensure_ascii=False, indent=2), encoding='utf-8')
-        
-        full_content = generate_llm_grouped_content(grouped_chunks, knowledge_base, level, total_chunks, all_chunks)
+        full_content = generate_llm_grouped_content(grouped_chunks, knowledge_base, level, total_chunks, type_counts)
         txt_file = Path(f"./{knowledge_base}_{level}_{total_chunks}chunks_LLM.txt")
         txt_file.write_text(full_content, encoding='utf-8')
         
@@ -450,50 +924,126 @@ def retrieve_training_content(knowledge_base: str, level: str) -> str:
         print(f"   📁 {cache_file.name}")
         print(f"   📄 {txt_file.name}")
     
-    full_context = generate_llm_grouped_content(grouped_chunks, knowledge_base, level, total_chunks, all_chunks)
+    return grouped_chunks, total_chunks, type_counts
+
+@tool(args_schema=TrainingContentInput)
+def retrieve_training_content(knowledge_base: str, level: str) -> str:
+    """✅ LLM GROUPS ALL CHUNKS → SAVES ROOT DIR → RETURNS SAME GROUPS FOR LLM"""
+    groups = _training_groups(knowledge_base, level)
+    if isinstance(groups, str):
+        return groups
+    grouped_chunks, total_chunks, type_counts = groups
+    
+    full_context = generate_llm_grouped_content(grouped_chunks, knowledge_base, level, total_chunks, type_counts)
     print(f"✅ {len(grouped_chunks)} LLM groups → SAME groups sent back to LLM")
     
     return full_context
 
+_RERANKER = None
+_RERANKER_LOCK = threading.Lock()
+
+def _get_reranker():
+    """Cross-encoder used to rerank chunks against a query (False if sentence-transformers is missing)"""
+    global _RERANKER
+    if _RERANKER is None:
+        with _RERANKER_LOCK:
+            if _RERANKER is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    logger.info(f"Loading reranker: {RERANK_MODEL}")
+                    _RERANKER = CrossEncoder(RERANK_MODEL)
+                except ImportError:
+                    logger.warning("sentence-transformers not installed, sending all chunks without reranking")
+                    _RERANKER = False
+    return _RERANKER
+
+def rerank_grouped_chunks(grouped: Dict[str, List[Document]], query: str, top_k: int) -> Dict[str, List[Document]]:
+    """Keep only the `top_k` chunks most relevant to `query`, still under their LLM groups"""
+    members = [(name, chunk) for name, group_chunks in grouped.items() for chunk in group_chunks]
+    reranker = _get_reranker()
+    if not reranker or len(members) <= top_k:
+        return grouped
+    
+    scores = reranker.predict([(query, chunk.page_content) for _, chunk in members], batch_size=32)
+    keep = set(np.argsort(scores)[::-1][:top_k].tolist())
+    
+    result: Dict[str, List[Document]] = {}
+    for i, (name, chunk) in enumerate(members):
+        if i in keep:
+            result.setdefault(name, []).append(chunk)
+    logger.info(f"Reranked {len(members)} chunks → kept top {top_k} across {len(result)} groups")
+    return result
+
+@lru_cache(maxsize=256)
+def _reranked_content(knowledge_base: str, level: str, query: str, top_k: int) -> str:
+    grouped = rerank_grouped_chunks(_training_groups(knowledge_base, level)[0], query, top_k)
+    kept = [chunk for group_chunks in grouped.values() for chunk in group_chunks]
+    type_counts = Counter(classify_chunk_type(c) for c in kept)
+    return generate_llm_grouped_content(grouped, knowledge_base, level, len(kept), type_counts)
+
+def retrieve_relevant_content(knowledge_base: str, level: str, query: str, top_k: int) -> str:
+    """Same layout as retrieve_training_content, but only with the chunks most relevant to `query` (memoized)"""
+    groups = _training_groups(knowledge_base, level)
+    if isinstance(groups, str):
+        return groups  # Not cached, so a knowledge base indexed later is picked up
+    return _reranked_content(knowledge_base, level, query, top_k)
+
+# Rule lines for the grouped content layout
+_EQ120 = "=" * 120
+_HASH120 = "#" * 120
+
 def generate_llm_grouped_content(grouped: Dict[str, List[Document]], knowledge_base: str, 
-                               level: str, total_chunks: int, all_chunks: List[Document]) -> str:
+                               level: str, total_chunks: int, type_counts: Counter) -> str:
     """✅ FIXED: Format for display + LLM context - Handles missing types"""
     
-    lines = []
-    lines.extend([
-        "=" * 120,
+    buf = io.StringIO()
+    
+    def write_lines(*lines):
+        buf.write("\n".join(lines))
+        buf.write("\n")
+    
+    write_lines(
+        _EQ120,
         f"🤖 LLM-ORGANIZED: {knowledge_base.upper()} - {level.upper()} LEVEL",
         f"📊 TOTAL: {total_chunks} CHUNKS | {len(grouped)} INTELLIGENT GROUPS",
         f"💾 Cache: ./{knowledge_base}_llm_groups.json (ROOT DIR)",
-        "=" * 120,
+        _EQ120,
         ""
-    ])
-    
-    # ✅ FIXED: Safe type counting
-    type_counts = {'Text': 0, 'Image': 0, 'Table': 0}
-    for chunk in all_chunks:
-        t = classify_chunk_type(chunk)
-        type_counts[t] = type_counts.get(t, 0) + 1
+    )
     
-    lines.extend([
+    # Counter returns 0 for missing types
+    write_lines(
         f"📈 BREAKDOWN: 📝 Text={type_counts['Text']} | 🖼️ Images={type_counts['Image']} | 📊 Tables={type_counts['Table']}",
         "",
         "🤖 LLM-ORGANIZED GROUPS (Use these exact groups):",
         ""
-    ])
+    )
+    
+    # Sort groups by size (largest first); each size is computed once
+    sized_groups = [(name, len(group_chunks), group_chunks) for name, group_chunks in grouped.items()]
+    sized_groups.sort(key=itemgetter(1), reverse=True)
     
-    # Sort groups by size (largest first)
-    sorted_groups = sorted(grouped.items(), key=lambda x: len(x[1]), reverse=True)
-    group_num = 1
+    # The LLM may put a chunk in several groups (or twice in one); send each chunk once, in its largest group
+    seen = set()
+    sorted_groups = []
+    for name, _, group_chunks in sized_groups:
+        unique_chunks = []
+        for chunk in group_chunks:
+            key = (chunk.metadata.get('source'), chunk.metadata.get('page'), chunk.page_content)
+            if key not in seen:
+                seen.add(key)
+                unique_chunks.append(chunk)
+        if unique_chunks:
+            sorted_groups.append((name, unique_chunks))
     
-    for group_name, group_chunks in sorted_groups:
-        lines.extend([
-            f"\n{'#'*120}",
+    for group_num, (group_name, group_chunks) in enumerate(sorted_groups, 1):
+        write_lines(
+            f"\n{_HASH120}",
             f"⭐ GROUP {group_num}: {group_name}",
             f"📊 {len(group_chunks)} FULL CHUNKS",
-            f"{'#'*120}",
+            _HASH120,
             ""
-        ])
+        )
         
         # ALL CHUNKS IN GROUP (FULL CONTENT)
         for chunk_idx, chunk in enumerate(group_chunks, 1):
@@ -509,27 +1059,131 @@ def generate_llm_grouped_content(grouped: Dict[str, List[Document]], knowledge_b
             elif chunk_type == 'Table':
                 visual_ref = "\n📊 TABLE DATA:"
             
-            lines.extend([
+            write_lines(
                 f"\n  🆔 CHUNK {chunk_idx}/{len(group_chunks)}",
                 f"  📍 {source} | Page {page} | Type: {chunk_type}",
-                visual_ref if visual_ref else "",
-                f"  📄 {'='*80}",
+                visual_ref,
+                "  ---",
                 f"  {chunk.page_content.strip()}",
-                f"  {'='*80}"
-            ])
-        
-        group_num += 1
+                "  ---"
+            )
     
-    lines.extend([
-        f"\n{'='*120}",
+    # Last block has no trailing newline (same text as joining all lines with "\n")
+    buf.write("\n".join((
+        f"\n{_EQ120}",
         f"✅ VERIFICATION: {total_chunks}/{total_chunks} chunks (100%)",
         f"📂 {len(grouped)} LLM groups preserved",
         f"🎯 SAME GROUPS SENT BACK TO LLM FOR Q&A",
         f"💾 Files saved in ROOT directory",
-        "=" * 120
-    ])
+        _EQ120
+    )))
     
-    return "\n".join(lines)
+    return buf.getvalue()
+
+# Lesson prompt: fixed system instructions (no template variables) + per-request user message
+LESSON_SYSTEM_PROMPT = """You are an **Ericsson Senior Telecom Training Architect**. Your task is to create a comprehensive, well-structured training lesson from the source documents you are given, for the knowledge base and training level named in the request.
+
+**REQUIRED STRUCTURE** (one ## header per section, in this order; where alternatives are given as `a | b`, use the one matching the training level - beginner | intermediate | advanced | architecture):
+```yaml
+1: Introduction                   # overview, learning objectives, prerequisites
+2: Fundamentals | Core Concepts | Advanced Overview | Architectural Overview     # key concepts, terminology
+3: Core Concepts | Practical Applications | Deep Dive Concepts | System Architecture  # detailed explanations, relationships
+4: Architectural Flow & Diagrams  # data/process flows, ASCII diagrams, component interactions (essential for architecture)
+5: Design Details | Common Scenarios | Advanced Configurations | Design Details    # examples, configuration, real-world use
+6: Best Practices | Troubleshooting | Edge Cases | Integration Points             # common issues, optimization, integration
+7: Summary / References           # key takeaways, source references
+```
+
+**CRITICAL REQUIREMENTS**:
+- Synthesize ALL provided content into natural, flowing prose - never mention "Group N" or "Chunk N"
+- Match depth and complexity to the training level
+- Use markdown headers (##, ###), lists, code blocks and tables where appropriate
+- Architecture level: include detailed ASCII diagrams or clear text descriptions of system flows
+- Keep transitions between sections smooth
+
+**OUTPUT**: Generate a complete, professional training lesson following the structure above. Make it engaging, clear, and appropriate for the requested level.
+"""
+
+LESSON_USER_PROMPT = """**KNOWLEDGE BASE**: {knowledge_base}
+
+**SOURCE DOCUMENTS** (Use ALL provided content - maintain accuracy, NO hallucination):
+
+{docs}
+
+**TRAINING LEVEL**: Tailor the lesson for {level} level learners.
+**INSTRUCTIONS**: {level_instructions}
+{reference_diagram}"""
+
+# Static instructions first (cacheable for every lesson), then the knowledge base and documents,
+# and the level-specific part last, so prompt-prefix caches hit as much of the prompt as possible
+LESSON_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", LESSON_SYSTEM_PROMPT),
+    ("user", LESSON_USER_PROMPT),
+])
+
+# Doubt resolution prompt: fixed instructions, then the knowledge base context, then the question
+DOUBT_SYSTEM_PROMPT = """**PRODUCTION-CRITICAL DOUBT RESOLUTION** using the LLM-organized knowledge base groups provided.
+
+**EXPECTED FORMAT**:
+1. **Direct Answer** (1 line)
+2. **Relevant LLM Group** (quote exact group name)
+3. **Step-by-Step Resolution**
+4. **MML Commands** (if applicable)
+5. **Image/Table References**
+6. **Verification Steps**
+
+**Answer using ONLY these LLM groups - no hallucination.**
+"""
+
+DOUBT_CONTEXT_PROMPT = """📚 **LLM-ORGANIZED CONTEXT** ({knowledge_base}):
+{docs}
+"""
+
+# Static instructions, then the session-constant context, then the doubt: consecutive doubts
+# in a session share everything but the last message, so prefix caches cover the documents too
+DOUBT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", DOUBT_SYSTEM_PROMPT),
+    ("user", DOUBT_CONTEXT_PROMPT),
+    ("user", "❓ **DOUBT**: {doubt}"),
+])
+
+@dataclass(frozen=True, slots=True)
+class _LevelCfg:
+    instructions: str
+    depth: str
+    sections: tuple
+
+# Per-level lesson settings, built once and read-only (looked up on every lesson request)
+_LEVEL_CONFIGS: Mapping[str, _LevelCfg] = MappingProxyType({
+    "beginner": _LevelCfg(
+        instructions="Use simple, clear language with step-by-step explanations. Focus on foundational concepts and basic understanding. Avoid jargon or explain it clearly when used.",
+        depth="basic",
+        sections=("Introduction", "Fundamentals", "Key Concepts", "Basic Examples", "Summary", "References")
+    ),
+    "intermediate": _LevelCfg(
+        instructions="Provide practical examples, real-world scenarios, and troubleshooting guidance. Include hands-on exercises and common use cases.",
+        depth="practical",
+        sections=("Overview", "Core Concepts", "Practical Applications", "Common Scenarios", "Troubleshooting", "Best Practices", "References")
+    ),
+    "advanced": _LevelCfg(
+        instructions="Dive deep into technical details, edge cases, optimization techniques, and advanced configurations. Include performance considerations and complex scenarios.",
+        depth="expert",
+        sections=("Advanced Overview", "Deep Dive Concepts", "Advanced Configurations", "Performance Optimization", "Edge Cases & Troubleshooting", "Best Practices & Patterns", "References")
+    ),
+    "architecture": _LevelCfg(
+        instructions="Focus on system design, architectural patterns, data flows, integration points, scalability, and high-level design decisions. Include architectural diagrams and design rationale.",
+        depth="system",
+        sections=("Architectural Overview", "System Architecture", "Architectural Flow & Diagrams", "Design Details", "Integration Points", "Scalability & Performance", "Design Patterns", "References")
+    ),
+})
+
+# Training levels in CLI order: (display name, subtitle, level key)
+_LEVELS = (
+    ("BEGINNER", "Core Fundamentals & Basic Commands", "beginner"),
+    ("INTERMEDIATE", "Practical Application & Procedures", "intermediate"),
+    ("ADVANCED", "Expert Troubleshooting & Optimization", "advanced"),
+    ("ARCHITECTURE", "System Design & Specifications", "architecture"),
+)
 
 # ✅ YOUR ComprehensiveTrainingCoach CLASS (UNCHANGED)
 class ComprehensiveTrainingCoach:
@@ -540,26 +1194,69 @@ class ComprehensiveTrainingCoach:
             console.print("[bold red]❌ No knowledge bases found![/bold red]")
             exit(1)
         console.print(f"[bold green]✅ {len(self.index_paths)} knowledge bases loaded![/bold green]\n")
+        self.lesson_cache = get_semantic_cache(LESSON_CACHE_PATH, EMBEDDINGS, threshold=None, ttl=LESSON_CACHE_TTL)
+        self.rerank = RERANK_DOCS
+        self._prefetched_lessons: Dict[str, tuple] = {}  # knowledge_base -> (levels, Future of generate_all_lessons)
+        # Load the models while the dashboard is being read, so the first lesson doesn't wait for them
+        threading.Thread(target=self._prewarm, name="coach-prewarm", daemon=True).start()
+        self.doubt_cache = get_semantic_cache(DOUBT_CACHE_PATH, EMBEDDINGS, threshold=DOUBT_CACHE_THRESHOLD, ttl=DOUBT_CACHE_TTL)
+    
+    def _prewarm(self):
+        """Build the LLM client, embeddings and reranker singletons (each is created once, so this is safe to race)"""
+        try:
+            get_llm()
+            get_embeddings()
+            if self.rerank:
+                _get_reranker()
+            logger.info("Models pre-warmed")
+        except Exception as e:
+            logger.warning(f"Pre-warming failed, models will load on first use: {e}")
+    
+    # Chains are composed once per coach, on first use. They pipe the real chat model (not the proxy,
+    # which LangChain would wrap as a plain callable) so that chain.stream() yields tokens as they arrive
+    @cached_property
+    def _lesson_chain(self):
+        return LESSON_PROMPT | LLM._get_llm() | StrOutputParser()
+    
+    @cached_property
+    def _doubt_chain(self):
+        return DOUBT_PROMPT | LLM._get_llm() | StrOutputParser()
     
     def _scan_indexes(self) -> Dict[str, str]:
         indexes = {}
         folders = ["alarm handling", "mml"]
-        for folder in folders:
+        
+        def load(folder):
+            """(index_path, doc_count or None, error or None) for one folder"""
             index_path = Path(f"{FAISS_ROOT}/{folder}")
-            if index_path.exists():
-                try:
-                    vectorstore = FAISS.load_local(str(index_path), EMBEDDINGS, allow_dangerous_deserialization=True)
-                    doc_count = len(vectorstore.index_to_docstore_id)
-                    indexes[folder] = str(index_path)
-                    console.print(f"  ✅ [cyan]{folder}[/cyan]: [yellow]{doc_count:,}[/yellow] documents")
-                except Exception as e:
-                    console.print(f"  ❌ [red]{folder}:[red] Load error - {e}")
-            else:
+            if not index_path.exists():
+                return index_path, None, None
+            try:
+                vectorstore = load_faiss_index(index_path)
+                return index_path, len(vectorstore.index_to_docstore_id), None
+            except Exception as e:
+                return index_path, None, e
+        
+        # The indexes are independent - load them concurrently, then report in the usual order
+        with ThreadPoolExecutor(max_workers=len(folders)) as executor:
+            results = list(executor.map(load, folders))
+        
+        for folder, (index_path, doc_count, error) in zip(folders, results):
+            if error is not None:
+                console.print(f"  ❌ [red]{folder}:[red] Load error - {error}")
+            elif doc_count is None:
                 console.print(f"  ❌ [red]{folder}:[/red] Directory not found")
+            else:
+                indexes[folder] = str(index_path)
+                console.print(f"  ✅ [cyan]{folder}[/cyan]: [yellow]{doc_count:,}[/yellow] documents")
         return indexes
     
     def show_welcome_dashboard(self):
         """Rich interactive dashboard"""
+        from rich.panel import Panel
+        from rich.prompt import Prompt
+        from rich.table import Table
+        from rich.text import Text
         console.clear()
         
         # Enhanced welcome
@@ -609,20 +1306,16 @@ class ComprehensiveTrainingCoach:
     
     def start_training_module(self, knowledge_base: str):
         """Progressive comprehensive training experience"""
+        from rich.panel import Panel
+        from rich.prompt import Prompt
+        from rich.table import Table
+        from rich.text import Text
         display_name = knowledge_base.replace('handling', 'Handling').title()
         
-        training_levels = {
-            0: ("BEGINNER", "Core Fundamentals & Basic Commands"),
-            1: ("INTERMEDIATE", "Practical Application & Procedures"), 
-            2: ("ADVANCED", "Expert Troubleshooting & Optimization"),
-            3: ("ARCHITECTURE", "System Design & Specifications")
-        }
-        
         current_level_idx = 0
         
         while True:
-            level_idx, (emoji, subtitle) = list(training_levels.items())[current_level_idx]
-            level_key = ["beginner", "intermediate", "advanced", "architecture"][current_level_idx]
+            emoji, subtitle, level_key = _LEVELS[current_level_idx]
             
             console.clear()
             
@@ -633,7 +1326,7 @@ class ComprehensiveTrainingCoach:
             
             header_panel = Panel(
                 header_content,
-                title=f"[bold blue]{knowledge_base.upper()}[/bold blue] | TRAINING LEVEL {level_idx+1}/4",
+                title=f"[bold blue]{knowledge_base.upper()}[/bold blue] | TRAINING LEVEL {current_level_idx+1}/{len(_LEVELS)}",
                 subtitle="[dim]LLM-organized content with diagrams, commands, architecture[/dim]",
                 border_style="bright_blue",
                 padding=(2, 2)
@@ -641,25 +1334,23 @@ class ComprehensiveTrainingCoach:
             console.print(header_panel)
             
             console.print("\n[bold]🔄 Loading LLM-organized content...[/bold]")
+            self._await_prefetched_lessons(knowledge_base, level_key)
             
             # Retrieve LLM-grouped content
-            content = retrieve_training_content.invoke({
-                "knowledge_base": knowledge_base,
-                "level": level_key
-            })
-            
-            # Generate DETAILED lesson using LLM groups
-            lesson = self.generate_comprehensive_lesson(knowledge_base, level_key, content)
+            content = self.retrieve_lesson_content(knowledge_base, level_key)
             
-            # Rich lesson display
-            lesson_panel = Panel(
-                lesson,
+            # Generate DETAILED lesson using LLM groups, rendered as it streams in
+            self._render_streaming_panel(
+                self.stream_comprehensive_lesson(knowledge_base, level_key, content),
                 title=f"[bold cyan]{emoji} {subtitle}[/bold cyan]",
                 border_style="cyan",
                 padding=(1, 2),
                 expand=False
             )
-            console.print(lesson_panel)
+            
+            # While the user reads this level, generate the others so NEXT LEVEL is instant
+            if knowledge_base not in self._prefetched_lessons:
+                self._prefetch_lessons(knowledge_base, [level for level in _LEVEL_CONFIGS if level != level_key])
             
             console.print("\n" + "─" * 120)
             
@@ -668,197 +1359,263 @@ class ComprehensiveTrainingCoach:
             nav_table.add_column("Action", style="bold cyan")
             nav_table.add_column("Description", style="white")
             
-            next_level = list(training_levels.keys())[(current_level_idx + 1) % 4]
-            next_display = list(training_levels.values())[(current_level_idx + 1) % 4][0]
+            next_display = _LEVELS[(current_level_idx + 1) % len(_LEVELS)][0]
             
             nav_table.add_row("1️⃣ NEXT LEVEL", f"→ {next_display}")
             nav_table.add_row("2️⃣ ASK DOUBT", "Interactive Q&A from LLM groups")
             nav_table.add_row("3️⃣ REPEAT", "Review current level")
             nav_table.add_row("4️⃣ DASHBOARD", "Return to module selection")
+            nav_table.add_row("5️⃣ ALL LEVELS", "Generate every level's lesson at once")
             nav_table.add_row("Q. QUIT", "Exit training")
             
             console.print(nav_table)
             
             choice = Prompt.ask(
                 "\n[bold cyan]What next?[/bold cyan]", 
-                choices=["1", "2", "3", "4", "q"], 
+                choices=["1", "2", "3", "4", "5", "q"], 
                 default="1"
             )
             
             if choice == "1":
-                current_level_idx = (current_level_idx + 1) % 4
+                current_level_idx = (current_level_idx + 1) % len(_LEVELS)
             elif choice == "2":
                 self.handle_comprehensive_doubts(knowledge_base, level_key)
             elif choice == "3":
                 continue
             elif choice == "4":
                 return
+            elif choice == "5":
+                console.print("\n[bold]🔄 Generating all levels concurrently...[/bold]")
+                self._await_prefetched_lessons(knowledge_base)
+                lessons = self.generate_all_lessons(knowledge_base, [level for _, _, level in _LEVELS])
+                for (emoji, subtitle, _), lesson in zip(_LEVELS, lessons.values()):
+                    console.print(Panel(
+                        lesson,
+                        title=f"[bold cyan]{emoji} {subtitle}[/bold cyan]",
+                        border_style="cyan",
+                        padding=(1, 2),
+                        expand=False
+                    ))
+                Prompt.ask("\n[dim]Press Enter to return[/dim]", default="")
             elif choice == "q":
                 return "quit"
     
+    def _prefetch_lessons(self, knowledge_base: str, levels: List[str]):
+        """Generate (and cache) lessons for `levels` on a background thread"""
+        future = Future()
+        
+        def run():
+            try:
+                future.set_result(self.generate_all_lessons(knowledge_base, levels))
+            except Exception as e:
+                logger.warning(f"Lesson prefetch failed for {knowledge_base}: {e}")
+                future.set_exception(e)
+        
+        # Daemon thread: quitting the CLI doesn't wait for lessons nobody will read
+        threading.Thread(target=run, name=f"lesson-prefetch-{knowledge_base}", daemon=True).start()
+        self._prefetched_lessons[knowledge_base] = (set(levels), future)
+    
+    def _await_prefetched_lessons(self, knowledge_base: str, level: Optional[str] = None):
+        """Wait for a running prefetch that covers `level` (any level if None) - it is already generating that lesson"""
+        prefetched = self._prefetched_lessons.get(knowledge_base)
+        if prefetched is None:
+            return
+        levels, future = prefetched
+        if future.done() or (level is not None and level not in levels):
+            return
+        with console.status("[dim]⏳ Finishing lessons prepared in the background...[/dim]"):
+            try:
+                future.result()
+            except Exception:
+                pass  # Logged by the prefetch thread; the lesson is generated in the foreground instead
+    
+    def retrieve_lesson_content(self, knowledge_base: str, level: str) -> str:
+        """Lesson context: the chunks most relevant to the level's focus, or the whole knowledge base without reranking"""
+        if not self.rerank:
+            return retrieve_training_content.invoke({"knowledge_base": knowledge_base, "level": level})
+        level_config = _LEVEL_CONFIGS.get(level.casefold(), _LEVEL_CONFIGS["beginner"])
+        # What the lesson covers (its sections), not how to write it - style words only blur the query
+        query = f"{knowledge_base.replace('_', ' ')}: {', '.join(level_config.sections[:-1])}"
+        return retrieve_relevant_content(knowledge_base, level, query, LESSON_RERANK_TOP_K)
+    
+    def retrieve_doubt_content(self, knowledge_base: str, doubt: str) -> str:
+        """Doubt context: the chunks most relevant to the doubt, or the whole knowledge base without reranking"""
+        if not self.rerank:
+            return retrieve_training_content.invoke({"knowledge_base": knowledge_base, "level": "advanced"})
+        return retrieve_relevant_content(knowledge_base, "advanced", doubt, DOUBT_RERANK_TOP_K)
+    
     def generate_comprehensive_lesson(self, knowledge_base: str, level: str, docs: str) -> str:
         """Generate structured, level-appropriate training lesson"""
-        level_configs = {
-            "beginner": {
-                "instructions": "Use simple, clear language with step-by-step explanations. Focus on foundational concepts and basic understanding. Avoid jargon or explain it clearly when used.",
-                "depth": "basic",
-                "sections": ["Introduction", "Fundamentals", "Key Concepts", "Basic Examples", "Summary", "References"]
-            },
-            "intermediate": {
-                "instructions": "Provide practical examples, real-world scenarios, and troubleshooting guidance. Include hands-on exercises and common use cases.",
-                "depth": "practical",
-                "sections": ["Overview", "Core Concepts", "Practical Applications", "Common Scenarios", "Troubleshooting", "Best Practices", "References"]
-            },
-            "advanced": {
-                "instructions": "Dive deep into technical details, edge cases, optimization techniques, and advanced configurations. Include performance considerations and complex scenarios.",
-                "depth": "expert",
-                "sections": ["Advanced Overview", "Deep Dive Concepts", "Advanced Configurations", "Performance Optimization", "Edge Cases & Troubleshooting", "Best Practices & Patterns", "References"]
-            },
-            "architecture": {
-                "instructions": "Focus on system design, architectural patterns, data flows, integration points, scalability, and high-level design decisions. Include architectural diagrams and design rationale.",
-                "depth": "system",
-                "sections": ["Architectural Overview", "System Architecture", "Architectural Flow & Diagrams", "Design Details", "Integration Points", "Scalability & Performance", "Design Patterns", "References"]
-            }
-        }
+        cached = self._cached_lesson(knowledge_base, level, docs)
+        if cached is not None:
+            return cached
+        lesson = self._lesson_chain.invoke(self._lesson_inputs(knowledge_base, level, docs))
+        self._cache_lesson(knowledge_base, level, docs, lesson)
+        return lesson
     
-        level_config = level_configs.get(level.lower(), level_configs["beginner"])
-        level_instructions = level_config["instructions"]
-        sections = level_config["sections"]
+    def generate_all_lessons(self, knowledge_base: str, levels: List[str]) -> Dict[str, str]:
+        """Generate lessons for several levels concurrently (cached levels are not regenerated)"""
+        lessons = {}
+        pending = []
+        for level in levels:
+            # Sequential on purpose: the first retrieval builds the LLM group cache the others reuse
+            docs = self.retrieve_lesson_content(knowledge_base, level)
+            cached = self._cached_lesson(knowledge_base, level, docs)
+            if cached is not None:
+                lessons[level] = cached
+            else:
+                pending.append((level, docs))
+        
+        if pending:
+            inputs = [self._lesson_inputs(knowledge_base, level, docs) for level, docs in pending]
+            results = self._lesson_chain.batch(inputs, config={"max_concurrency": LESSON_CONCURRENCY})
+            for (level, docs), lesson in zip(pending, results):
+                self._cache_lesson(knowledge_base, level, docs, lesson)
+                lessons[level] = lesson
+        return {level: lessons[level] for level in levels}
     
-        prompt = ChatPromptTemplate.from_template("""
-You are an **Ericsson Senior Telecom Training Architect** specializing in {knowledge_base}. Your task is to create a comprehensive, well-structured training lesson tailored for {level} level learners.
-
-**SOURCE DOCUMENTS** (Use ALL provided content - maintain accuracy, NO hallucination):
-
-{docs}
-
-**TRAINING LEVEL**: {level}
-**INSTRUCTIONS**: {level_instructions}
-
-**REQUIRED STRUCTURE** (Follow this exact format):
-
-## 1. Introduction
-- Brief overview of the topic
-- Learning objectives
-- Prerequisites (if any)
-- What you will learn
-
-## 2. Fundamentals / Core Concepts / Advanced Overview / Architectural Overview
-(Choose section name based on level)
-- Essential concepts and principles
-- Key terminology and definitions
-- Foundation knowledge required
-
-## 3. Core Concepts / Practical Applications / Deep Dive Concepts / System Architecture
-(Choose section name based on level)
-- Detailed explanations
-- Important concepts and their relationships
-- Technical details appropriate for {level} level
-
-## 4. Architectural Flow & Diagrams
-(Especially important for architecture level, but include for all levels when relevant)
-- System/data flow descriptions
-- Architecture diagrams (use ASCII art or detailed text descriptions)
-- Component interactions
-- Process flows
-- Integration points
-
-## 5. Design Details / Common Scenarios / Advanced Configurations / Design Details
-(Choose section name based on level)
-- Practical examples and use cases
-- Configuration details
-- Implementation guidance
-- Real-world scenarios
-
-## 6. Best Practices / Troubleshooting / Edge Cases / Integration Points
-(Choose section name based on level)
-- Industry best practices
-- Common issues and solutions
-- Optimization tips
-- Integration considerations
-
-## 7. Summary / References
-- Key takeaways
-- Summary of important points
-- References to source documents
-- Additional resources
-
-**CRITICAL REQUIREMENTS**:
-1. **NO "Group 1", "Chunk 1", "Chunk 2" labels** - Transform raw content into natural, flowing prose
-2. **Structured sections** - Use clear markdown headers (##, ###) for each section
-3. **Level-appropriate depth** - Adjust complexity and detail based on {level}
-4. **Architecture diagrams** - For architecture level, include detailed ASCII diagrams or clear text descriptions of system flows
-5. **Professional formatting** - Use bullet points, numbered lists, code blocks, and tables where appropriate
-6. **Complete content** - Synthesize information from all provided chunks into coherent sections
-7. **No raw chunk references** - Do NOT mention "chunk X" or "group Y" in the output
-8. **Smooth transitions** - Make content flow naturally between sections
-
-**OUTPUT**: Generate a complete, professional training lesson following the structure above. Make it engaging, clear, and appropriate for {level} level learners.
-""")
+    def stream_comprehensive_lesson(self, knowledge_base: str, level: str, docs: str):
+        """Same as generate_comprehensive_lesson, but yields the lesson text as the LLM produces it"""
+        cached = self._cached_lesson(knowledge_base, level, docs)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in self._lesson_chain.stream(self._lesson_inputs(knowledge_base, level, docs)):
+            chunks.append(chunk)
+            yield chunk
+        self._cache_lesson(knowledge_base, level, docs, "".join(chunks))
     
-        chain = prompt | LLM | StrOutputParser()
+    def _cached_lesson(self, knowledge_base: str, level: str, docs: str):
+        """Previously generated lesson for this knowledge base/level and identical content, or None"""
+        try:
+            cached = self.lesson_cache.get(docs, namespace=f"{knowledge_base}:{level}")
+        except Exception as e:
+            logger.warning(f"Lesson cache lookup failed: {e}")
+            return None
+        if cached is None:
+            return None
+        logger.info(f"♻️ Cached lesson reused ({knowledge_base}/{level})")
+        return cached["lesson"]
+    
+    def _cache_lesson(self, knowledge_base: str, level: str, docs: str, lesson: str):
+        try:
+            self.lesson_cache.put(docs, {"lesson": lesson}, namespace=f"{knowledge_base}:{level}")
+        except Exception as e:
+            logger.warning(f"Could not cache lesson: {e}")
+    
+    def _lesson_inputs(self, knowledge_base: str, level: str, docs: str) -> dict:
+        """Input variables of the lesson chain"""
+        level_config = _LEVEL_CONFIGS.get(level.casefold(), _LEVEL_CONFIGS["beginner"])
+        level_instructions = level_config.instructions
+        sections = level_config.sections
     
         logger.info(f"Generating {level} level lesson for {knowledge_base}")
-        logger.debug(f"Using sections: {sections}")
+        logger.debug("Using sections: %s", sections)
         
-        return chain.invoke({
+        return {
             "knowledge_base": knowledge_base,
             "level": level,
             "docs": docs,
-            "level_instructions": level_instructions
-        })
+            "level_instructions": level_instructions,
+            "reference_diagram": reference_diagram(knowledge_base, level)
+        }
     
     def handle_comprehensive_doubts(self, knowledge_base: str, current_level: str):
         """Production-grade doubt clearing using LLM groups"""
+        from rich.panel import Panel
+        from rich.prompt import Prompt
         console.print("\n🆘 [bold red]EXPERT TECHNICAL SUPPORT[/bold red]")
         console.print(f"[cyan]🔒 Context Locked: {knowledge_base.title()} | Level: {current_level}[/cyan]")
         console.print("[dim]💭 Ask production-level doubts ('back' to return)[/dim]\n")
         
+        # Without reranking every doubt gets the same context - retrieve it once, in the background
+        # while the user is typing the first doubt (reranked context is retrieved per doubt)
+        docs_future = None
+        if not self.rerank:
+            executor = ThreadPoolExecutor(max_workers=1)
+            docs_future = executor.submit(retrieve_training_content.invoke, {
+                "knowledge_base": knowledge_base,
+                "level": "advanced"
+            })
+            executor.shutdown(wait=False)
+        
         while True:
             doubt = Prompt.ask("[bold yellow]❓ TECHNICAL DOUBT[/bold yellow]").strip()
             if doubt.lower() in ['back', 'return', 'menu']:
                 break
             
             console.print("[dim]🔍 Searching LLM-organized knowledge base...[/dim]")
-            answer = self.answer_comprehensive_doubt(knowledge_base, doubt)
-            
-            doubt_panel = Panel(
-                answer,
+            docs = docs_future.result() if docs_future else None
+            self._render_streaming_panel(
+                self.stream_comprehensive_doubt(knowledge_base, doubt, docs),
                 title="[bold green]💡 EXPERT RESOLUTION[/bold green]", 
                 border_style="green",
                 padding=(1, 2)
             )
-            console.print(doubt_panel)
             console.print()
     
-    def answer_comprehensive_doubt(self, knowledge_base: str, doubt: str) -> str:
-        """Comprehensive technical doubt resolution using LLM groups"""
-        docs = retrieve_training_content.invoke({
-            "knowledge_base": knowledge_base,
-            "level": "advanced"
-        })
+    def answer_comprehensive_doubt(self, knowledge_base: str, doubt: str, docs: Optional[str] = None) -> str:
+        """Comprehensive technical doubt resolution using LLM groups (pass `docs` to reuse already retrieved context)"""
+        cached = self._cached_doubt(knowledge_base, doubt)
+        if cached is not None:
+            return cached
+        if docs is None:
+            docs = self.retrieve_doubt_content(knowledge_base, doubt)
         
-        prompt = ChatPromptTemplate.from_template("""
-**PRODUCTION-CRITICAL DOUBT RESOLUTION** using {knowledge_base} LLM groups:
-
-❓ **DOUBT**: {doubt}
-
-📚 **LLM-ORGANIZED CONTEXT**:
-{docs}
-
-**EXPECTED FORMAT**:
-1. **Direct Answer** (1 line)
-2. **Relevant LLM Group** (quote exact group name)
-3. **Step-by-Step Resolution**
-4. **MML Commands** (if applicable)
-5. **Image/Table References**
-6. **Verification Steps**
-
-**Answer using ONLY these LLM groups - no hallucination.**
-""")
+        answer = self._doubt_chain.invoke({"knowledge_base": knowledge_base, "doubt": doubt, "docs": docs})
+        self._cache_doubt(knowledge_base, doubt, answer)
+        return answer
+    
+    def stream_comprehensive_doubt(self, knowledge_base: str, doubt: str, docs: Optional[str] = None):
+        """Same as answer_comprehensive_doubt, but yields the answer text as the LLM produces it"""
+        cached = self._cached_doubt(knowledge_base, doubt)
+        if cached is not None:
+            yield cached
+            return
+        if docs is None:
+            docs = self.retrieve_doubt_content(knowledge_base, doubt)
         
-        chain = prompt | LLM | StrOutputParser()
-        return chain.invoke({"knowledge_base": knowledge_base, "doubt": doubt, "docs": docs})
+        chunks = []
+        for chunk in self._doubt_chain.stream({"knowledge_base": knowledge_base, "doubt": doubt, "docs": docs}):
+            chunks.append(chunk)
+            yield chunk
+        self._cache_doubt(knowledge_base, doubt, "".join(chunks))
+    
+    def _cached_doubt(self, knowledge_base: str, doubt: str):
+        """Earlier answer to the same (or a rephrased) doubt on this knowledge base, or None"""
+        try:
+            cached = self.doubt_cache.get(doubt, namespace=knowledge_base)
+            return cached["answer"] if cached else None
+        except Exception as e:
+            logger.warning(f"Doubt cache lookup failed: {e}")
+            return None
+    
+    def _cache_doubt(self, knowledge_base: str, doubt: str, answer: str):
+        try:
+            self.doubt_cache.put(doubt, {"answer": answer}, namespace=knowledge_base)
+        except Exception as e:
+            logger.warning(f"Could not cache doubt answer: {e}")
+    
+    def _render_streaming_panel(self, chunks, **panel_kwargs) -> str:
+        """Render streamed text into a live-updating Rich panel; returns the full text"""
+        from rich.live import Live
+        from rich.markdown import Markdown
+        from rich.panel import Panel
+        parts = []
+        last_update = 0.0
+        with Live(Panel("", **panel_kwargs), console=console, refresh_per_second=STREAM_REFRESH_PER_SECOND) as live:
+            for chunk in chunks:
+                parts.append(chunk)
+                # Re-parsing the Markdown costs O(length) - do it once per refresh, not once per token
+                now = time.monotonic()
+                if now - last_update >= 1 / STREAM_REFRESH_PER_SECOND:
+                    live.update(Panel(Markdown("".join(parts)), **panel_kwargs))
+                    last_update = now
+            text = "".join(parts)
+            live.update(Panel(Markdown(text), **panel_kwargs))
+        logger.debug("Streamed %d characters into panel", len(text))
+        return text
     
     def run(self):
         """Main enterprise training platform"""
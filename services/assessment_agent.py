@@ -2,15 +2,84 @@
 import logging
 from services.ai_coach import ComprehensiveTrainingCoach
 import services.ai_coach
+from services.semantic_cache import get_semantic_cache
 
 logger = logging.getLogger(__name__)
 
 retrieve_training_content = services.ai_coach.retrieve_training_content
 LLM = services.ai_coach.LLM
+knowledge_fingerprint = services.ai_coach.knowledge_fingerprint
+
+# Knowledge bases searched for assessment context
+ASSESSMENT_KNOWLEDGE_BASES = ("mml", "alarm_handling")
+
+# Assessments of the same approach (after whitespace/case normalization) are reused instead of
+# re-running the LLM, as long as the knowledge bases they were graded against haven't been rebuilt since.
+# Exact match only: near-identical submissions can deserve different scores
+ASSESSMENT_CACHE_PATH = "data/assessment_cache.pkl"
+ASSESSMENT_CACHE_TTL = 7 * 24 * 3600  # seconds
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+# orjson is optional: faster parsing of the LLM's JSON assessment
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Score in a response that isn't valid JSON, e.g. '"score": 82'
+_SCORE_RE = re.compile(r'score["\']?\s*:\s*(\d+)', re.IGNORECASE)
+
+# Markdown code fence around the JSON (```json ... ``` or ``` ... ```); the closing fence may be missing
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*(?:```)?\s*$', re.DOTALL)
+
+# Fixed rubric and output format - identical for every assessment
+ASSESSMENT_SYSTEM_PROMPT = """You are an **Expert Telecom Training Assessor** evaluating a learner's approach to a technical scenario.
+
+**YOUR TASK**: Provide comprehensive assessment with:
+1. **Strengths** - What the learner did well
+2. **Areas for Improvement** - Specific gaps or issues
+3. **Technical Accuracy** - Correctness of approach, commands, procedures
+4. **Best Practices Alignment** - How well it follows industry standards
+5. **Risk Assessment** - Potential issues or risks in the approach
+6. **Recommendations** - Specific actionable improvements
+
+**SCORING CRITERIA** (0-100):
+- Technical Accuracy: 30 points
+- Best Practices: 25 points
+- Completeness: 20 points
+- Risk Awareness: 15 points
+- Innovation/Problem-Solving: 10 points
+
+**OUTPUT FORMAT** (JSON):
+{{
+    "feedback": "Detailed feedback text covering all assessment points",
+    "score": <integer 0-100>,
+    "strengths": ["strength1", "strength2"],
+    "improvements": ["improvement1", "improvement2"],
+    "technical_notes": "Specific technical observations"
+}}
+"""
+
+ASSESSMENT_USER_PROMPT = """**RELEVANT KNOWLEDGE BASE CONTENT**:
+{knowledge_content}
+
+**USER'S APPROACH**: {scenario}
+
+**RESPONSE** (JSON only, no markdown):"""
+
+# Static rubric as the system message, the per-request fields last, so prompt-prefix caches
+# on the LLM endpoint cover the rubric on every call
+ASSESSMENT_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", ASSESSMENT_SYSTEM_PROMPT),
+    ("user", ASSESSMENT_USER_PROMPT),
+])
 
 class AssessmentAgent:
     """Agent that assesses user's approach and provides feedback with scores"""
@@ -30,6 +99,7 @@ class AssessmentAgent:
             logger.error(f"Unexpected error initializing AssessmentAgent: {str(e)}")
             logger.exception("Full traceback:")
             self.comprehensive_coach = None
+        self.cache = get_semantic_cache(ASSESSMENT_CACHE_PATH, None, threshold=None, ttl=ASSESSMENT_CACHE_TTL)
     
     def handle_request(self, scenario: str):
         """
@@ -46,68 +116,129 @@ class AssessmentAgent:
         logger.info(f"  Scenario: {scenario[:100]}..." if len(scenario) > 100 else f"  Scenario: {scenario}")
         logger.info("="*80)
         
+        namespace = self._cache_namespace()
+        try:
+            cached = self.cache.get(scenario, namespace=namespace)
+            if cached is not None:
+                logger.info("Returning cached assessment")
+                return cached
+        except Exception as e:
+            logger.warning(f"Assessment cache lookup failed: {str(e)}")
+        
+        assessment, parsed = self._assess(scenario)
+        if parsed:
+            self._cache_assessment(scenario, assessment, namespace)
+        return assessment
+    
+    def stream_request(self, scenario: str):
+        """
+        Assess user's approach, yielding the raw LLM output as it is generated
+        
+        Yields:
+            {"token": text} events, then the parsed assessment (feedback, score, strengths, ...)
+        """
+        logger.info("="*80)
+        logger.info("ASSESSMENT AGENT: Handling streaming request")
+        logger.info(f"  Scenario: {scenario[:100]}..." if len(scenario) > 100 else f"  Scenario: {scenario}")
+        logger.info("="*80)
+        
+        namespace = self._cache_namespace()
+        try:
+            cached = self.cache.get(scenario, namespace=namespace)
+            if cached is not None:
+                logger.info("Returning cached assessment")
+                yield cached
+                return
+        except Exception as e:
+            logger.warning(f"Assessment cache lookup failed: {str(e)}")
+        
+        chain, prompt_vars = self._prepare_chain(scenario)
+        chunks = []
+        for chunk in chain.stream(prompt_vars):
+            chunks.append(chunk)
+            yield {"token": chunk}
+        assessment_text = "".join(chunks)
+        logger.info(f"Assessment stream complete: {len(assessment_text)} characters")
+        
+        assessment, parsed = self._parse_assessment(assessment_text)
+        if parsed:
+            self._cache_assessment(scenario, assessment, namespace)
+        yield assessment
+    
+    # Composed once, on first use, piping the real chat model so that chain.stream() yields tokens
+    @cached_property
+    def _assessment_chain(self):
+        logger.info("Building prompt chain for assessment")
+        return ASSESSMENT_PROMPT | LLM._get_llm() | StrOutputParser()
+    
+    @staticmethod
+    def _cache_namespace() -> str:
+        """Cache namespace tied to the current knowledge base indexes (a rebuild starts a fresh namespace)"""
+        return f"assessment:{knowledge_fingerprint(ASSESSMENT_KNOWLEDGE_BASES)}"
+    
+    def _cache_assessment(self, scenario: str, assessment: dict, namespace: str):
+        """Store a parsed assessment, dropping the ones graded against knowledge bases that have since been rebuilt"""
+        try:
+            self.cache.drop_namespaces("assessment:", keep=namespace)
+            self.cache.put(scenario, assessment, namespace=namespace)
+        except Exception as e:
+            logger.warning(f"Could not cache assessment: {str(e)}")
+    
+    def _assess(self, scenario: str):
+        """Run the assessment LLM chain and parse its response; returns (assessment, parsed) like _parse_assessment"""
+        chain, prompt_vars = self._prepare_chain(scenario)
+        try:
+            logger.info("Invoking LLM chain for assessment...")
+            assessment_text = chain.invoke(prompt_vars)
+            
+            logger.info("="*80)
+            logger.info("ASSESSMENT RESPONSE RECEIVED")
+            logger.info(f"  Response length: {len(assessment_text)} characters")
+            logger.debug("  Response preview (first 200 chars): %.200s...", assessment_text)
+            logger.info("="*80)
+        except Exception as e:
+            logger.error("="*80)
+            logger.error("ASSESSMENT LLM INVOCATION FAILED")
+            logger.error(f"  Error: {str(e)}")
+            logger.error(f"  Scenario: {scenario}")
+            logger.exception("Full traceback:")
+            logger.error("="*80)
+            raise
+        
+        return self._parse_assessment(assessment_text)
+    
+    def _prepare_chain(self, scenario: str):
+        """Retrieve knowledge base context and build the assessment chain with its inputs"""
         # Retrieve relevant content for assessment context
-        knowledge_bases = ["mml", "alarm_handling"]
+        knowledge_bases = ASSESSMENT_KNOWLEDGE_BASES
         relevant_content = []
         
         logger.info(f"Searching {len(knowledge_bases)} knowledge bases for assessment context")
-        for kb in knowledge_bases:
-            try:
-                logger.debug(f"Retrieving content from knowledge base: {kb}")
-                content = retrieve_training_content.invoke({
+        # The knowledge bases are independent - submit every retrieval first, then collect in order
+        with ThreadPoolExecutor(max_workers=len(knowledge_bases)) as executor:
+            futures = {
+                kb: executor.submit(retrieve_training_content.invoke, {
                     "knowledge_base": kb,
                     "level": "advanced",
                     "topic": scenario
                 })
-                if content and not content.startswith("❌"):
-                    logger.info(f"Found relevant content in {kb}: {len(content)} characters")
-                    relevant_content.append(f"=== {kb.upper()} KNOWLEDGE BASE ===\n{content}\n")
-                else:
-                    logger.debug(f"No relevant content found in {kb}")
-            except Exception as e:
-                logger.warning(f"Error retrieving content from {kb}: {str(e)}")
-                continue
+                for kb in knowledge_bases
+            }
+            for kb, future in futures.items():
+                try:
+                    logger.debug("Retrieving content from knowledge base: %s", kb)
+                    content = future.result()
+                    if content and not content.startswith("❌"):
+                        logger.info(f"Found relevant content in {kb}: {len(content)} characters")
+                        relevant_content.append(f"=== {kb.upper()} KNOWLEDGE BASE ===\n{content}\n")
+                    else:
+                        logger.debug("No relevant content found in %s", kb)
+                except Exception as e:
+                    logger.warning(f"Error retrieving content from {kb}: {str(e)}")
+                    continue
         
         logger.info(f"Retrieved content from {len(relevant_content)} knowledge base(s)")
         
-        # Generate assessment
-        prompt = ChatPromptTemplate.from_template("""
-You are an **Expert Telecom Training Assessor** evaluating a learner's approach to a technical scenario.
-
-**USER'S APPROACH**: {scenario}
-
-**RELEVANT KNOWLEDGE BASE CONTENT**:
-{knowledge_content}
-
-**YOUR TASK**: Provide comprehensive assessment with:
-1. **Strengths** - What the learner did well
-2. **Areas for Improvement** - Specific gaps or issues
-3. **Technical Accuracy** - Correctness of approach, commands, procedures
-4. **Best Practices Alignment** - How well it follows industry standards
-5. **Risk Assessment** - Potential issues or risks in the approach
-6. **Recommendations** - Specific actionable improvements
-
-**SCORING CRITERIA** (0-100):
-- Technical Accuracy: 30 points
-- Best Practices: 25 points
-- Completeness: 20 points
-- Risk Awareness: 15 points
-- Innovation/Problem-Solving: 10 points
-
-**OUTPUT FORMAT** (JSON):
-{{
-    "feedback": "Detailed feedback text covering all assessment points",
-    "score": <integer 0-100>,
-    "strengths": ["strength1", "strength2"],
-    "improvements": ["improvement1", "improvement2"],
-    "technical_notes": "Specific technical observations"
-}}
-
-**RESPONSE** (JSON only, no markdown):
-        """)
-        
-        logger.info("Building prompt chain for assessment")
-        chain = prompt | LLM | StrOutputParser()
         
         knowledge_content = "\n\n".join(relevant_content) if relevant_content else "No specific knowledge base content found. Assess based on general telecom best practices."
         logger.info(f"Prepared knowledge content: {len(knowledge_content)} characters")
@@ -122,51 +253,33 @@ You are an **Expert Telecom Training Assessor** evaluating a learner's approach
         logger.info(f"  Scenario length: {len(scenario)} characters")
         logger.info(f"  Knowledge content length: {len(knowledge_content)} characters")
         logger.info("="*80)
+        return self._assessment_chain, prompt_vars
+    
+    def _parse_assessment(self, assessment_text: str):
+        """
+        Parse the LLM's JSON assessment, falling back to the raw text if it isn't valid JSON
         
-        try:
-            logger.info("Invoking LLM chain for assessment...")
-            assessment_text = chain.invoke(prompt_vars)
-            
-            logger.info("="*80)
-            logger.info("ASSESSMENT RESPONSE RECEIVED")
-            logger.info(f"  Response length: {len(assessment_text)} characters")
-            logger.debug(f"  Response preview (first 200 chars): {assessment_text[:200]}...")
-            logger.info("="*80)
-        except Exception as e:
-            logger.error("="*80)
-            logger.error("ASSESSMENT LLM INVOCATION FAILED")
-            logger.error(f"  Error: {str(e)}")
-            logger.error(f"  Scenario: {scenario}")
-            logger.exception("Full traceback:")
-            logger.error("="*80)
-            raise
-        
+        Returns:
+            (assessment, parsed) - parsed is False for the fallback, which must not be cached
+        """
         # Try to parse JSON response, fallback to text if parsing fails
         logger.info("Parsing assessment response (expecting JSON format)")
         try:
             # Clean up the response - remove markdown code blocks if present
-            cleaned = assessment_text.strip()
-            logger.debug(f"Original response length: {len(cleaned)}")
-            
-            if cleaned.startswith("```json"):
-                cleaned = cleaned[7:]
-                logger.debug("Removed ```json prefix")
-            if cleaned.startswith("```"):
-                cleaned = cleaned[3:]
-                logger.debug("Removed ``` prefix")
-            if cleaned.endswith("```"):
-                cleaned = cleaned[:-3]
-                logger.debug("Removed ``` suffix")
-            cleaned = cleaned.strip()
+            logger.debug("Original response length: %d", len(assessment_text))
+            fence_match = _FENCE_RE.match(assessment_text)
+            cleaned = fence_match.group(1) if fence_match else assessment_text.strip()
             
-            logger.debug(f"Cleaned response length: {len(cleaned)}")
-            logger.debug(f"Attempting JSON parse...")
-            assessment_data = json.loads(cleaned)
+            logger.debug("Cleaned response length: %d", len(cleaned))
+            logger.debug("Attempting JSON parse...")
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so one except covers both
+            assessment_data = orjson.loads(cleaned) if ORJSON_AVAILABLE else json.loads(cleaned)
             logger.info("JSON parsing successful")
-            logger.debug(f"Parsed keys: {list(assessment_data.keys())}")
+            logger.debug("Parsed keys: %s", list(assessment_data.keys()))
             
-            # Ensure required fields
-            if "score" not in assessment_data:
+            # Ensure required fields (a defaulted score isn't a real grade, so that result isn't cacheable)
+            scored = "score" in assessment_data
+            if not scored:
                 logger.warning("Score not found in parsed JSON, using default: 75")
                 assessment_data["score"] = 75  # Default score
             if "feedback" not in assessment_data:
@@ -180,7 +293,7 @@ You are an **Expert Telecom Training Assessor** evaluating a learner's approach
                 "strengths": assessment_data.get("strengths", []),
                 "improvements": assessment_data.get("improvements", []),
                 "technical_notes": assessment_data.get("technical_notes", "")
-            }
+            }, scored
         except (json.JSONDecodeError, KeyError) as e:
             logger.warning(f"JSON parsing failed: {str(e)}")
             logger.warning("Falling back to text extraction")
@@ -188,8 +301,7 @@ You are an **Expert Telecom Training Assessor** evaluating a learner's approach
             score = 75
             if "score" in assessment_text.lower():
                 # Try to extract number
-                import re
-                score_match = re.search(r'score["\']?\s*:\s*(\d+)', assessment_text, re.IGNORECASE)
+                score_match = _SCORE_RE.search(assessment_text)
                 if score_match:
                     score = int(score_match.group(1))
                     logger.info(f"Extracted score from text: {score}")
@@ -205,5 +317,5 @@ You are an **Expert Telecom Training Assessor** evaluating a learner's approach
                 "strengths": [],
                 "improvements": [],
                 "technical_notes": ""
-            }
+            }, False
 
@@ -0,0 +1,49 @@
+"""
+Diagrams - Canonical ASCII architecture diagrams for the known knowledge bases
+
+Architecture lessons get these as a starting point to adapt, so the LLM doesn't spend
+output tokens drawing the same diagram from scratch on every request.
+"""
+
+ARCH_DIAGRAMS = {
+    "mml": """
++------------+   MML command    +----------------+   parsed order   +--------------------+
+|  Operator  | ---------------> |  MML Handler   | ---------------> |  Command Executor  |
+| (terminal) |                  | (syntax/auth   |                  | (per function      |
++------------+                  |  validation)   |                  |  block)            |
+      ^                         +----------------+                  +---------+----------+
+      |                                 |                                     |
+      |       printout / result         | reject (syntax, authority)         | read / update
+      +---------------------------------+                                     v
+      ^                                                            +--------------------+
+      |                 result code + printout                     |  Managed Objects / |
+      +----------------------------------------------------------- |  Node Data         |
+                                                                   +--------------------+
+""",
+    "alarm_handling": """
++-----------------+  fault event   +------------------+  alarm raised   +------------------+
+| Network Element | -------------> | Alarm Detection  | --------------> |   Alarm List     |
+| (HW / SW / link)|                | (filter, severity|                 | (active alarms)  |
++-----------------+                |  classification) |                 +--------+---------+
+        ^                          +------------------+                          |
+        |                                                                         | notify
+        | corrective action                                                       v
++-------+---------+   acknowledge / analyse   +------------------+   forward   +------------------+
+|    Operator     | <------------------------ | Fault Management | <---------- |  OSS / NMS       |
+|                 | ------------------------> | (correlation,    |             |  Northbound IF   |
++-----------------+   clear / ceasing alarm   |  history log)    |             +------------------+
+                                              +------------------+
+""",
+}
+
+
+def reference_diagram(knowledge_base: str, level: str) -> str:
+    """Prompt section with the stored diagram for architecture lessons, or "" (other levels / unknown knowledge bases)"""
+    diagram = ARCH_DIAGRAMS.get(knowledge_base.casefold())
+    if level.casefold() != "architecture" or diagram is None:
+        return ""
+    diagram = diagram.strip("\n")
+    return (
+        "**REFERENCE DIAGRAM**: Adapt the diagram below to the source documents; do not redraw it from scratch.\n"
+        f"```\n{diagram}\n```\n"
+    )
@@ -0,0 +1,155 @@
+"""
+HTTP Client - Shared, pooled connection to the backend API for the Streamlit pages
+"""
+import json
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as BackendUnavailable, Timeout as RequestTimeout
+from urllib3.util.retry import Retry
+
+# Try to import cachecontrol (honours the backend's ETag / Cache-Control headers on GETs)
+try:
+    from cachecontrol import CacheControlAdapter
+    CACHECONTROL_AVAILABLE = True
+except ImportError:
+    CACHECONTROL_AVAILABLE = False
+
+# Try to import msgpack (smaller, faster bodies for progress updates)
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Try to import orjson (much faster for the large training_content payloads)
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Backend base URL (override with AICOACH_BACKEND for other deployments)
+BACKEND_URL = os.environ.get("AICOACH_BACKEND", "http://127.0.0.1:8000").rstrip("/")
+
+# Endpoint URLs - built once here, since page scripts are re-executed on every rerun
+LOGIN_URL = f"{BACKEND_URL}/auth/login"
+TRAINING_STREAM_URL = f"{BACKEND_URL}/training/stream"
+MENTOR_STREAM_URL = f"{BACKEND_URL}/mentor/stream"
+GENERATE_QUESTIONS_URL = f"{BACKEND_URL}/generate_questions"
+DOC_JOBS_URL = f"{BACKEND_URL}/generate_document/jobs"  # + /{job_id} (state) and /{job_id}/file
+EVALUATE_STREAM_URL = f"{BACKEND_URL}/evaluate_assessment/stream"
+PROGRESS_URL = f"{BACKEND_URL}/user/progress/update"
+USER_URL = f"{BACKEND_URL}/user"  # + /{username}/profile etc.
+
+# Timeouts in seconds - (connect, read) for streams, where read is the longest gap between events
+QUICK_TIMEOUT = 5  # login, user data, progress updates, job polling
+SUBMIT_TIMEOUT = 10  # queuing a background job
+QUESTIONS_TIMEOUT = 30
+DOWNLOAD_TIMEOUT = 60
+TRAINING_STREAM_TIMEOUT = (10, 450)  # retrieval + first token can take minutes
+MENTOR_STREAM_TIMEOUT = (10, 180)
+EVALUATE_STREAM_TIMEOUT = (10, 180)
+
+# Download MIME types
+PDF_MIME = "application/pdf"
+PPT_MIME = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def dumps(payload) -> bytes:
+    """Serialize a request body to JSON bytes"""
+    if ORJSON_AVAILABLE:
+        # Non-str keys (e.g. question indices) are stringified, as json.dumps does
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload).encode()
+
+
+def loads(data):
+    """Parse a JSON document (bytes or str); raises ValueError on bad input"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_json(response: requests.Response):
+    """Drop-in for response.json() using the fast parser (an empty body parses as {})"""
+    content = response.content
+    return loads(content) if content else {}
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Create one keep-alive session per Streamlit process, reused across reruns and pages"""
+    session = requests.Session()
+    # With cachecontrol, unchanged GET responses are revalidated with If-None-Match and replayed from memory on 304
+    adapter_class = CacheControlAdapter if CACHECONTROL_AVAILABLE else HTTPAdapter
+    adapter = adapter_class(
+        pool_connections=10,
+        pool_maxsize=20,
+        # Connection errors and gateway hiccups are retried (urllib3 never retries POSTs on status)
+        max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+    )
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+def post_json(url: str, payload, **kwargs) -> requests.Response:
+    """POST `payload` as JSON on the shared session (serialized here instead of by requests)"""
+    headers = {**JSON_HEADERS, **kwargs.pop("headers", {})}
+    return get_session().post(url, data=dumps(payload), headers=headers, **kwargs)
+
+
+def post_msgpack(url: str, payload, **kwargs) -> requests.Response:
+    """POST `payload` as MessagePack (falls back to JSON if msgpack isn't installed)"""
+    if not MSGPACK_AVAILABLE:
+        return post_json(url, payload, **kwargs)
+    headers = {"Content-Type": "application/msgpack", **kwargs.pop("headers", {})}
+    return get_session().post(url, data=msgpack.packb(payload), headers=headers, **kwargs)
+
+
+def auth_headers() -> dict:
+    """Bearer header for the logged-in user (per request - the pooled session is shared by every user)"""
+    token = st.session_state.get("auth_token")
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def redirect_to_login():
+    """Forget the stale login and send the user back to the login page"""
+    st.session_state.auth_token = None
+    st.session_state.username = None
+    st.session_state.user_info = None
+    st.switch_page("pages/0_login.py")
+
+
+def check_unauthorized(response: requests.Response):
+    """On 401 the token is stale, so log the user out"""
+    if response.status_code == 401:
+        redirect_to_login()
+
+
+def iter_sse(response: requests.Response):
+    """Yield the JSON payload of each `data:` line from a Server-Sent Events response"""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data: "):
+            yield loads(line[6:])
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Small worker pool for fire-and-forget calls (shared by all sessions in this process)"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="aicoach-bg")
+
+
+def post_in_background(url: str, payload: dict, timeout: float = QUICK_TIMEOUT) -> Future:
+    """POST `payload` (MessagePack) to `url` on a worker thread so the page can keep rendering; the result is not awaited"""
+    # Headers are read here - session state is not available on the worker thread
+    return get_executor().submit(
+        post_msgpack, url, payload, headers=auth_headers(), timeout=timeout
+    )
@@ -0,0 +1,68 @@
+"""
+Job Queue - Runs slow backend work on worker threads and tracks it by job id for polling
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETE = "complete"
+FAILED = "failed"
+
+
+class JobQueue:
+    """In-process job store: submit() returns an id immediately, get() reports state and result"""
+
+    def __init__(self, max_workers: int = 2, ttl: float = 600):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="aicoach-job")
+        self.ttl = ttl  # seconds a finished job is kept for the client to collect
+        self.jobs: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> str:
+        """Queue fn(*args, **kwargs) and return its job id"""
+        self._purge_expired()
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {"state": PENDING, "result": None, "error": None, "finished_at": None}
+        self.executor.submit(self._run, job_id, fn, args, kwargs)
+        logger.debug(f"Job {job_id} queued: {getattr(fn, '__name__', fn)}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Snapshot of a job (state, result, error), or None if unknown or expired"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _run(self, job_id: str, fn: Callable, args: tuple, kwargs: dict):
+        self._update(job_id, state=RUNNING)
+        try:
+            result = fn(*args, **kwargs)
+            self._update(job_id, state=COMPLETE, result=result, finished_at=time.monotonic())
+            logger.debug(f"Job {job_id} complete")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            logger.exception("Full traceback:")
+            self._update(job_id, state=FAILED, error=str(e), finished_at=time.monotonic())
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            if job_id in self.jobs:
+                self.jobs[job_id].update(fields)
+
+    def _purge_expired(self):
+        """Drop finished jobs nobody collected within the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        with self.lock:
+            expired = [job_id for job_id, job in self.jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]
+            for job_id in expired:
+                del self.jobs[job_id]
@@ -0,0 +1,36 @@
+"""
+Log Config - Console + daily log file output through a background queue listener
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+
+
+def setup_logging(file_prefix: str):
+    """
+    Configure root logging once per process (later calls are no-ops, like logging.basicConfig).
+
+    Log calls only enqueue the record; a background listener thread does the stdout and
+    logs/<file_prefix>_YYYYMMDD.log writes, so no disk I/O happens on the calling thread.
+    """
+    if logging.getLogger().handlers:
+        return
+    os.makedirs("logs", exist_ok=True)
+    log_queue = queue.Queue(-1)
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        handlers=[logging.handlers.QueueHandler(log_queue)]
+    )
+    listener = logging.handlers.QueueListener(
+        log_queue,
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler(f'logs/{file_prefix}_{datetime.now().strftime("%Y%m%d")}.log'),
+        respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)  # flush what's still queued on exit
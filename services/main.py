@@ -1,57 +1,54 @@
+import hashlib
+import json
 import logging
-import sys
+import os
 import time
 from datetime import datetime
-from fastapi import FastAPI
-from pydantic import BaseModel
-from services.agent_orchestrator import AgentOrchestrator
+from typing import Optional
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from pydantic import BaseModel, ValidationError
+from services.agent_orchestrator import get_orchestrator
 from services.user_service import (
     authenticate_user, get_user_profile, get_user_progress,
-    update_user_progress, get_user_statistics, get_recommendations
+    update_user_progress, get_user_statistics, get_recommendations,
+    get_user_dashboard, create_auth_token, verify_auth_token
 )
 from services.document_generator import generate_document
-from fastapi.responses import FileResponse, StreamingResponse
+from services.job_queue import COMPLETE, FAILED, JobQueue
+from services.log_config import setup_logging
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+
+# Try to import orjson (faster JSON for API responses, SSE events and request bodies)
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Try to import msgpack (compact progress-update bodies from the Streamlit pages)
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
 
 # Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(f'logs/api_{datetime.now().strftime("%Y%m%d")}.log')
-    ]
-)
+setup_logging("api")
 logger = logging.getLogger(__name__)
 
-# Ensure logs directory exists
-import os
-os.makedirs('logs', exist_ok=True)
-
 # Initialize FastAPI app
 app = FastAPI(
     title="AI Telecom Training Coach API",
     description="Backend API for AI-powered telecom training platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 logger.info("="*80)
 logger.info("FastAPI application initialized")
 logger.info("="*80)
 
-# Agent Orchestrator instance (lazy initialization to avoid startup errors)
-agent_orchestrator = None
-
-def get_agent_orchestrator():
-    """Lazy initialization of agent orchestrator"""
-    global agent_orchestrator
-    if agent_orchestrator is None:
-        logger.info("Initializing AgentOrchestrator (lazy initialization)")
-        agent_orchestrator = AgentOrchestrator()
-        logger.info("AgentOrchestrator initialized successfully")
-    else:
-        logger.debug("Using existing AgentOrchestrator instance")
-    return agent_orchestrator
-
 # Request models
 class TrainingRequest(BaseModel):
     level: str  # Training level: 'beginner', 'intermediate', 'advanced', or 'architecture'
@@ -100,7 +97,7 @@ async def training(request: TrainingRequest):
     
     try:
         logger.debug("Getting agent orchestrator")
-        orchestrator = get_agent_orchestrator()
+        orchestrator = get_orchestrator()
         
         logger.info(f"🔄 [API] Routing to training agent: level={request.level}, kb={request.knowledge_base}")
         routing_start = time.time()
@@ -115,7 +112,7 @@ async def training(request: TrainingRequest):
             logger.error(f"❌ [API] Error message: {response.get('message', 'No message')}")
         else:
             logger.info("✅ [API] Training content generated successfully")
-            logger.debug(f"Response keys: {list(response.keys())}")
+            logger.debug("Response keys: %s", list(response.keys()))
             if "training_content" in response:
                 content_length = len(response["training_content"])
                 logger.info(f"📊 [API] Training content length: {content_length} characters")
@@ -154,6 +151,43 @@ async def training(request: TrainingRequest):
             "message": error_msg
         }
 
+def _sse_event(payload: dict) -> str:
+    """Format one Server-Sent Events message"""
+    if ORJSON_AVAILABLE:
+        return f"data: {orjson.dumps(payload).decode()}\n\n"
+    return f"data: {json.dumps(payload)}\n\n"
+
+def _sse_stream(events, label: str):
+    """Wrap agent events as SSE messages, ending with a done event (errors are sent as events)"""
+    try:
+        for event in events:
+            yield _sse_event(event)
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"Exception in {label} stream: {error_msg}")
+        logger.exception("Full traceback:")
+        yield _sse_event({
+            "error": "Internal server error",
+            "message": error_msg
+        })
+    yield _sse_event({"done": True})
+
+# Streaming endpoint for the training agent (Server-Sent Events)
+@app.post("/training/stream")
+async def training_stream(request: TrainingRequest):
+    """Stream training content as SSE: data: {"token": ...} ... data: {"done": true}"""
+    logger.info("="*80)
+    logger.info(f"🌐 [API] TRAINING STREAM REQUEST RECEIVED")
+    logger.info(f"  Level: {request.level}")
+    logger.info(f"  Knowledge Base: {request.knowledge_base}")
+    logger.info("="*80)
+    
+    def events():
+        orchestrator = get_orchestrator()
+        yield from orchestrator.stream_training_agent(request.level, request.knowledge_base)
+    
+    return StreamingResponse(_sse_stream(events(), "training"), media_type="text/event-stream")
+
 # Endpoint for mentor agent
 @app.post("/mentor")
 async def mentor(request: MentorRequest):
@@ -166,7 +200,7 @@ async def mentor(request: MentorRequest):
     
     try:
         logger.debug("Getting agent orchestrator")
-        orchestrator = get_agent_orchestrator()
+        orchestrator = get_orchestrator()
         
         logger.info(f"Routing to mentor agent: query_length={len(request.query)}, context={request.context}")
         response = orchestrator.route_to_mentor_agent(request.query, request.context)
@@ -190,6 +224,22 @@ async def mentor(request: MentorRequest):
             "message": error_msg
         }
 
+# Streaming endpoint for mentor agent (Server-Sent Events)
+@app.post("/mentor/stream")
+async def mentor_stream(request: MentorRequest):
+    """Stream mentor guidance as SSE: data: {"token": ...} ... data: {"done": true}"""
+    logger.info("="*80)
+    logger.info(f"MENTOR STREAM REQUEST RECEIVED")
+    logger.info(f"  Query: {request.query[:100]}..." if len(request.query) > 100 else f"  Query: {request.query}")
+    logger.info(f"  Context: {request.context}")
+    logger.info("="*80)
+    
+    def events():
+        orchestrator = get_orchestrator()
+        yield from orchestrator.stream_mentor_agent(request.query, request.context)
+    
+    return StreamingResponse(_sse_stream(events(), "mentor"), media_type="text/event-stream")
+
 # Endpoint for assessment agent
 @app.post("/assessment")
 async def assessment(request: AssessmentRequest):
@@ -201,7 +251,7 @@ async def assessment(request: AssessmentRequest):
     
     try:
         logger.debug("Getting agent orchestrator")
-        orchestrator = get_agent_orchestrator()
+        orchestrator = get_orchestrator()
         
         logger.info(f"Routing to assessment agent: scenario_length={len(request.scenario)}")
         response = orchestrator.route_to_assessment_agent(request.scenario)
@@ -250,8 +300,8 @@ async def generate_questions(request: TopicRequest):
                 "message": f"No questions available for topic '{request.topic}'. Available topics: {list(question_bank.keys())}"
             }
         
-        # Shuffle questions for variety
-        random.shuffle(questions)
+        # Shuffle questions for variety (a copy - the bank itself is shared across requests)
+        questions = random.sample(questions, len(questions))
         
         logger.info(f"Generated {len(questions)} questions for topic: {request.topic}")
         return {"questions": questions}
@@ -264,26 +314,22 @@ async def generate_questions(request: TopicRequest):
             "message": error_msg
         }
 
-# Endpoint for evaluating assessment answers
-@app.post("/evaluate_assessment")
-async def evaluate_assessment(request: EvaluateAssessmentRequest):
-    """Evaluate user's answers and provide feedback with score"""
-    logger.info("="*80)
-    logger.info(f"EVALUATE ASSESSMENT REQUEST RECEIVED")
-    logger.info(f"  Number of answers: {len(request.answers)}")
-    logger.info("="*80)
-    
+def _answers_to_scenario(answers: dict) -> str:
+    """Convert answers dict to a scenario string for assessment"""
+    # Format: "Question 1: [answer1]\nQuestion 2: [answer2]..."
+    # (JSON object keys arrive as strings, hence int())
+    scenario_parts = []
+    for idx, answer in answers.items():
+        scenario_parts.append(f"Question {int(idx)+1}: {answer}")
+    return "\n".join(scenario_parts)
+
+def _evaluate_answers(answers: dict) -> dict:
+    """Run the assessment agent over the submitted answers (blocking - minutes with a slow LLM)"""
     try:
         logger.debug("Getting agent orchestrator")
-        orchestrator = get_agent_orchestrator()
-        
-        # Convert answers dict to a scenario string for assessment
-        # Format: "Question 1: [answer1]\nQuestion 2: [answer2]..."
-        scenario_parts = []
-        for idx, answer in request.answers.items():
-            scenario_parts.append(f"Question {idx+1}: {answer}")
+        orchestrator = get_orchestrator()
         
-        scenario = "\n".join(scenario_parts)
+        scenario = _answers_to_scenario(answers)
         
         logger.info(f"Routing to assessment agent: scenario_length={len(scenario)}")
         response = orchestrator.route_to_assessment_agent(scenario)
@@ -309,6 +355,31 @@ async def evaluate_assessment(request: EvaluateAssessmentRequest):
             "message": error_msg
         }
 
+def _log_evaluate_request(request: EvaluateAssessmentRequest, mode: str):
+    logger.info("="*80)
+    logger.info(f"EVALUATE ASSESSMENT REQUEST RECEIVED ({mode})")
+    logger.info(f"  Number of answers: {len(request.answers)}")
+    logger.info("="*80)
+
+# Endpoint for evaluating assessment answers
+@app.post("/evaluate_assessment")
+async def evaluate_assessment(request: EvaluateAssessmentRequest):
+    """Evaluate user's answers and provide feedback with score"""
+    _log_evaluate_request(request, "sync")
+    return _evaluate_answers(request.answers)
+
+# Streaming evaluation (Server-Sent Events)
+@app.post("/evaluate_assessment/stream")
+async def evaluate_assessment_stream(request: EvaluateAssessmentRequest):
+    """Stream the evaluation as SSE: data: {"token": ...} ... data: {"feedback": ..., "score": ...} then data: {"done": true}"""
+    _log_evaluate_request(request, "stream")
+    
+    def events():
+        orchestrator = get_orchestrator()
+        yield from orchestrator.stream_assessment_agent(_answers_to_scenario(request.answers))
+    
+    return StreamingResponse(_sse_stream(events(), "evaluate_assessment"), media_type="text/event-stream")
+
 # User authentication and profile endpoints
 @app.post("/auth/login")
 async def login(request: LoginRequest):
@@ -322,6 +393,7 @@ async def login(request: LoginRequest):
         return {
             "success": True,
             "user": user,
+            "token": create_auth_token(request.username),
             "message": "Login successful"
         }
     else:
@@ -331,57 +403,122 @@ async def login(request: LoginRequest):
             "message": "Invalid username or password"
         }
 
+def get_token_user(authorization: Optional[str] = Header(None)) -> str:
+    """Resolve the bearer token to a username; a missing or bad token is rejected with 401"""
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    scheme, _, token = authorization.partition(" ")
+    token_user = verify_auth_token(token) if scheme.lower() == "bearer" else None
+    if token_user is None:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    return token_user
+
+def _etag_response(http_request: Request, payload: dict) -> Response:
+    """
+    JSON response with a strong ETag (SHA-256 of the canonical body).
+    
+    User data changes with every progress update, so clients must revalidate (no-cache);
+    an unchanged resource is answered with an empty 304 instead of the full body.
+    """
+    if ORJSON_AVAILABLE:
+        body = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)
+    else:
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+    headers = {
+        "ETag": f'"{hashlib.sha256(body).hexdigest()}"',
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization"
+    }
+    if http_request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def check_user_access(username: str, token_user: str):
+    """A token may only read or update its own user's data"""
+    if token_user != username:
+        raise HTTPException(status_code=403, detail="Token does not match user")
+
 @app.get("/user/{username}/profile")
-async def get_profile(username: str):
+async def get_profile(username: str, http_request: Request, token_user: str = Depends(get_token_user)):
     """Get user profile information"""
+    check_user_access(username, token_user)
     logger.info(f"Getting profile for: {username}")
     profile = get_user_profile(username)
     
     if profile:
-        return {"success": True, "profile": profile}
+        return _etag_response(http_request, {"success": True, "profile": profile})
     else:
-        return {"success": False, "message": "User not found"}
+        return _etag_response(http_request, {"success": False, "message": "User not found"})
 
 @app.get("/user/{username}/progress")
-async def get_progress(username: str):
+async def get_progress(username: str, http_request: Request, token_user: str = Depends(get_token_user)):
     """Get user's learning progress"""
+    check_user_access(username, token_user)
     logger.info(f"Getting progress for: {username}")
     progress = get_user_progress(username)
-    return {"success": True, "progress": progress}
+    return _etag_response(http_request, {"success": True, "progress": progress})
 
 @app.get("/user/{username}/statistics")
-async def get_statistics(username: str):
+async def get_statistics(username: str, http_request: Request, token_user: str = Depends(get_token_user)):
     """Get user statistics for dashboard"""
+    check_user_access(username, token_user)
     logger.info(f"Getting statistics for: {username}")
     stats = get_user_statistics(username)
-    return {"success": True, "statistics": stats}
+    return _etag_response(http_request, {"success": True, "statistics": stats})
 
 @app.get("/user/{username}/recommendations")
-async def get_user_recommendations(username: str):
+async def get_user_recommendations(username: str, http_request: Request, token_user: str = Depends(get_token_user)):
     """Get personalized learning recommendations"""
+    check_user_access(username, token_user)
     logger.info(f"Getting recommendations for: {username}")
     recommendations = get_recommendations(username)
-    return {"success": True, "recommendations": recommendations}
+    return _etag_response(http_request, {"success": True, "recommendations": recommendations})
+
+@app.get("/user/{username}/dashboard")
+async def get_dashboard(username: str, http_request: Request, token_user: str = Depends(get_token_user)):
+    """Get profile, statistics and recommendations in a single response (profile page)"""
+    check_user_access(username, token_user)
+    logger.info(f"Getting dashboard for: {username}")
+    dashboard = get_user_dashboard(username)
+    
+    if dashboard:
+        return _etag_response(http_request, {"success": True, **dashboard})
+    else:
+        return _etag_response(http_request, {"success": False, "message": "User not found"})
+
+async def _parse_progress_update(http_request: Request) -> ProgressUpdateRequest:
+    """Read a progress update sent as JSON or MessagePack (Content-Type: application/msgpack)"""
+    body = await http_request.body()
+    try:
+        if http_request.headers.get("content-type", "").startswith("application/msgpack"):
+            if not MSGPACK_AVAILABLE:
+                raise HTTPException(status_code=415, detail="msgpack is not installed on the server")
+            data = msgpack.unpackb(body)
+        else:
+            data = orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
+        return ProgressUpdateRequest.model_validate(data)
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid progress update: {e}")
 
 @app.post("/user/progress/update")
-async def update_progress(request: ProgressUpdateRequest):
+async def update_progress(
+    request: ProgressUpdateRequest = Depends(_parse_progress_update),
+    token_user: str = Depends(get_token_user)
+):
     """Update user's learning progress"""
+    check_user_access(request.username, token_user)
     logger.info(f"Updating progress for {request.username}: {request.activity_type}")
     update_user_progress(request.username, request.activity_type, request.activity_data)
     return {"success": True, "message": "Progress updated successfully"}
 
-# Document generation endpoint
-@app.post("/generate_document")
-async def generate_training_document(request: DocumentGenerationRequest):
-    """Generate PDF or PPT document from training content"""
-    logger.info("="*80)
-    logger.info(f"🌐 [API] DOCUMENT GENERATION REQUEST")
-    logger.info(f"  Format: {request.format_type}")
-    logger.info(f"  Level: {request.level}")
-    logger.info(f"  Knowledge Base: {request.knowledge_base}")
-    logger.info(f"  Title: {request.title}")
-    logger.info("="*80)
-    
+def _document_error(message: str) -> dict:
+    return {"error": "Document Generation Error", "message": message}
+
+def _render_document(request: DocumentGenerationRequest) -> dict:
+    """
+    Generate the document and return either an error dict or
+    {"content": bytes, "media_type": str, "filename": str}
+    """
     try:
         # Generate document
         output_path = generate_document(
@@ -398,10 +535,7 @@ async def generate_training_document(request: DocumentGenerationRequest):
             file_size = os.path.getsize(output_path)
             if file_size == 0:
                 logger.error(f"Generated document is empty: {output_path}")
-                return {
-                    "error": "Document Generation Error",
-                    "message": "Generated document is empty. Please try again."
-                }
+                return _document_error("Generated document is empty. Please try again.")
             
             logger.info(f"✅ Document generated: {output_path} ({file_size} bytes)")
             
@@ -414,47 +548,93 @@ async def generate_training_document(request: DocumentGenerationRequest):
                 if request.format_type.lower() == "pdf":
                     if not file_content.startswith(b'%PDF'):
                         logger.error(f"Generated file is not a valid PDF: {output_path}")
-                        return {
-                            "error": "Document Generation Error",
-                            "message": "Generated PDF file is corrupted. Please try again."
-                        }
+                        return _document_error("Generated PDF file is corrupted. Please try again.")
                 # Verify PPTX magic bytes (ZIP format)
                 elif request.format_type.lower() in ["ppt", "pptx"]:
                     if not file_content.startswith(b'PK'):
                         logger.error(f"Generated file is not a valid PPTX: {output_path}")
-                        return {
-                            "error": "Document Generation Error",
-                            "message": "Generated PowerPoint file is corrupted. Please try again."
-                        }
+                        return _document_error("Generated PowerPoint file is corrupted. Please try again.")
                 
-                # Return file using StreamingResponse for better handling
-                from io import BytesIO
-                
-                return StreamingResponse(
-                    BytesIO(file_content),
-                    media_type="application/pdf" if request.format_type.lower() == "pdf" else "application/vnd.openxmlformats-officedocument.presentationml.presentation",
-                    headers={"Content-Disposition": f'attachment; filename="{os.path.basename(output_path)}"'}
-                )
+                return {
+                    "content": file_content,
+                    "media_type": "application/pdf" if request.format_type.lower() == "pdf" else "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+                    "filename": os.path.basename(output_path)
+                }
             except Exception as e:
                 logger.error(f"Error reading generated file: {str(e)}")
                 logger.exception("Full traceback:")
-                return {
-                    "error": "Document Generation Error",
-                    "message": f"Error reading generated file: {str(e)}"
-                }
+                return _document_error(f"Error reading generated file: {str(e)}")
         else:
             logger.error("Failed to generate document - output_path is None or file doesn't exist")
-            return {
-                "error": "Document Generation Error",
-                "message": "Failed to generate document. Please check if required libraries are installed (reportlab for PDF, python-pptx for PPT)."
-            }
+            return _document_error("Failed to generate document. Please check if required libraries are installed (reportlab for PDF, python-pptx for PPT).")
     except Exception as e:
         logger.error(f"Error generating document: {str(e)}")
         logger.exception("Full traceback:")
+        return _document_error(f"Failed to generate document: {str(e)}")
+
+def _document_response(document: dict) -> StreamingResponse:
+    """Stream a generated document back as a file download"""
+    from io import BytesIO
+    
+    return StreamingResponse(
+        BytesIO(document["content"]),
+        media_type=document["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{document["filename"]}"'}
+    )
+
+def _log_document_request(request: DocumentGenerationRequest, mode: str):
+    logger.info("="*80)
+    logger.info(f"🌐 [API] DOCUMENT GENERATION REQUEST ({mode})")
+    logger.info(f"  Format: {request.format_type}")
+    logger.info(f"  Level: {request.level}")
+    logger.info(f"  Knowledge Base: {request.knowledge_base}")
+    logger.info(f"  Title: {request.title}")
+    logger.info("="*80)
+
+# Document generation endpoint
+@app.post("/generate_document")
+async def generate_training_document(request: DocumentGenerationRequest):
+    """Generate PDF or PPT document from training content"""
+    _log_document_request(request, "sync")
+    document = _render_document(request)
+    if "error" in document:
+        return document
+    return _document_response(document)
+
+# Background document generation: submit a job, poll its state, then fetch the file
+document_jobs = JobQueue(max_workers=2)
+
+@app.post("/generate_document/jobs")
+async def submit_document_job(request: DocumentGenerationRequest):
+    """Queue document generation and return its job id immediately"""
+    _log_document_request(request, "job")
+    return {"job_id": document_jobs.submit(_render_document, request)}
+
+@app.get("/generate_document/jobs/{job_id}")
+async def document_job_status(job_id: str):
+    """Report a document job's state ('pending', 'running', 'complete' or 'failed')"""
+    job = document_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    
+    result = job["result"] or {}
+    if job["state"] == FAILED or "error" in result:
         return {
-            "error": "Document Generation Error",
-            "message": f"Failed to generate document: {str(e)}"
+            "state": FAILED,
+            "error": result.get("error", "Document Generation Error"),
+            "message": result.get("message", job["error"] or "")
         }
+    return {"state": job["state"]}
+
+@app.get("/generate_document/jobs/{job_id}/file")
+async def document_job_file(job_id: str):
+    """Download the document produced by a completed job"""
+    job = document_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    if job["state"] != COMPLETE or "error" in job["result"]:
+        raise HTTPException(status_code=409, detail=f"Job is {job['state']}")
+    return _document_response(job["result"])
 
 # Health check endpoint
 @app.get("/health")
@@ -46,6 +46,63 @@ class MentorAgent:
         logger.info(f"  Context: {context}")
         logger.info("="*80)
         
+        chain, prompt_vars = self._build_mentor_chain(query, context)
+        
+        try:
+            logger.info("Invoking LLM chain for mentor response...")
+            mentor_response = chain.invoke(prompt_vars)
+            
+            logger.info("="*80)
+            logger.info("MENTOR RESPONSE RECEIVED")
+            logger.info(f"  Response length: {len(mentor_response)} characters")
+            logger.debug("  Response preview (first 200 chars): %.200s...", mentor_response)
+            logger.info("="*80)
+            
+            return {
+                "mentor_response": mentor_response
+            }
+        except Exception as e:
+            self._log_failure(e, query, context)
+            raise
+    
+    def stream_request(self, query: str, context: str = "training"):
+        """
+        Streaming variant of handle_request
+        
+        Yields:
+            {"token": str} events as the mentor response is generated
+        """
+        logger.info("="*80)
+        logger.info("MENTOR AGENT: Handling streaming request")
+        logger.info(f"  Query: {query[:100]}..." if len(query) > 100 else f"  Query: {query}")
+        logger.info(f"  Context: {context}")
+        logger.info("="*80)
+        
+        chain, prompt_vars = self._build_mentor_chain(query, context)
+        
+        try:
+            logger.info("Streaming LLM chain for mentor response...")
+            total_length = 0
+            for token in chain.stream(prompt_vars):
+                total_length += len(token)
+                yield {"token": token}
+            logger.info(f"Mentor response streamed: {total_length} characters")
+        except Exception as e:
+            self._log_failure(e, query, context)
+            raise
+    
+    def _log_failure(self, e: Exception, query: str, context: str):
+        """Log an LLM invocation failure with the request details"""
+        logger.error("="*80)
+        logger.error("MENTOR LLM INVOCATION FAILED")
+        logger.error(f"  Error: {str(e)}")
+        logger.error(f"  Query: {query}")
+        logger.error(f"  Context: {context}")
+        logger.exception("Full traceback:")
+        logger.error("="*80)
+    
+    def _build_mentor_chain(self, query: str, context: str):
+        """Retrieve knowledge base context and build the mentor prompt chain with its inputs"""
         # Try to retrieve relevant content from knowledge bases
         knowledge_bases = ["mml", "alarm_handling"]
         relevant_content = []
@@ -53,7 +110,7 @@ class MentorAgent:
         logger.info(f"Searching {len(knowledge_bases)} knowledge bases for relevant content")
         for kb in knowledge_bases:
             try:
-                logger.debug(f"Retrieving content from knowledge base: {kb}")
+                logger.debug("Retrieving content from knowledge base: %s", kb)
                 content = retrieve_training_content.invoke({
                     "knowledge_base": kb,
                     "level": "advanced",
@@ -63,7 +120,7 @@ class MentorAgent:
                     logger.info(f"Found relevant content in {kb}: {len(content)} characters")
                     relevant_content.append(f"=== {kb.upper()} KNOWLEDGE BASE ===\n{content}\n")
                 else:
-                    logger.debug(f"No relevant content found in {kb}")
+                    logger.debug("No relevant content found in %s", kb)
             except Exception as e:
                 logger.warning(f"Error retrieving content from {kb}: {str(e)}")
                 continue
@@ -99,7 +156,9 @@ You are a **Senior Telecom Engineer and Mentor** with decades of experience in E
         """)
         
         logger.info("Building prompt chain for mentor response")
-        chain = prompt | LLM | StrOutputParser()
+        # Pipe the real chat model, not the proxy: LangChain wraps the proxy as a plain callable,
+        # which would make chain.stream() yield the whole reply as one chunk
+        chain = prompt | LLM._get_llm() | StrOutputParser()
         
         knowledge_content = "\n\n".join(relevant_content) if relevant_content else "No specific knowledge base content found. Use your general telecom expertise."
         logger.info(f"Prepared knowledge content: {len(knowledge_content)} characters")
@@ -117,26 +176,5 @@ You are a **Senior Telecom Engineer and Mentor** with decades of experience in E
         logger.info(f"  Knowledge content length: {len(knowledge_content)} characters")
         logger.info("="*80)
         
-        try:
-            logger.info("Invoking LLM chain for mentor response...")
-            mentor_response = chain.invoke(prompt_vars)
-            
-            logger.info("="*80)
-            logger.info("MENTOR RESPONSE RECEIVED")
-            logger.info(f"  Response length: {len(mentor_response)} characters")
-            logger.debug(f"  Response preview (first 200 chars): {mentor_response[:200]}...")
-            logger.info("="*80)
-            
-            return {
-                "mentor_response": mentor_response
-            }
-        except Exception as e:
-            logger.error("="*80)
-            logger.error("MENTOR LLM INVOCATION FAILED")
-            logger.error(f"  Error: {str(e)}")
-            logger.error(f"  Query: {query}")
-            logger.error(f"  Context: {context}")
-            logger.exception("Full traceback:")
-            logger.error("="*80)
-            raise
+        return chain, prompt_vars
 
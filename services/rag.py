@@ -10,6 +10,8 @@ from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 from langchain_community.document_loaders import PyMuPDFLoader, UnstructuredPDFLoader
 from tqdm import tqdm
 import json
+import sys
+import faiss
 import fitz  # PyMuPDF for image extraction
 
 # ✅ Configuration
@@ -20,6 +22,12 @@ EMBEDDINGS = HuggingFaceBgeEmbeddings(
     encode_kwargs={"normalize_embeddings": True},
 )
 
+# HNSW graph parameters (approximate search; L2 metric like the default flat index)
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+# FAISS_HNSW=1: write new indexes as HNSW straight away (otherwise flat; convert later with --hnsw)
+BUILD_HNSW = os.getenv("FAISS_HNSW") == "1"
+
 def extract_images_pymupdf(pdf_path: str, output_dir: str):
     """✅ Extract images using PyMuPDF (works when Unstructured fails)"""
     try:
@@ -130,6 +138,8 @@ def create_robust_faiss_index(root_dir: str):
         # ✅ Create FAISS index
         vectorstore = FAISS.from_documents(splits, EMBEDDINGS)
         vectorstore.save_local(index_dir)
+        if BUILD_HNSW:
+            rebuild_index_as_hnsw(index_dir)
         
         # ✅ Save index info
         index_info = {
@@ -154,7 +164,26 @@ def create_robust_faiss_index(root_dir: str):
     
     print("\n🎉 ✅ ROBUST INDEXES CREATED - pdfminer-proof!")
 
+def rebuild_index_as_hnsw(index_dir: str):
+    """✅ Convert a saved flat FAISS index to HNSW in place (vector order, and so the docstore mapping, is unchanged)"""
+    old_index = faiss.read_index(f"{index_dir}/index.faiss")
+    if isinstance(old_index, faiss.IndexHNSWFlat):
+        print(f"✅ {index_dir}: already HNSW")
+        return
+    vectors = old_index.reconstruct_n(0, old_index.ntotal)
+    new_index = faiss.IndexHNSWFlat(old_index.d, HNSW_M)
+    new_index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    new_index.add(vectors)
+    faiss.write_index(new_index, f"{index_dir}/index.faiss")
+    print(f"✅ {index_dir}: {new_index.ntotal} vectors → HNSW (M={HNSW_M})")
+
 if __name__ == "__main__":
+    # python rag.py --hnsw: convert existing indexes instead of re-indexing the PDFs
+    if "--hnsw" in sys.argv:
+        for index_dir in sorted(Path("faiss_indexes").glob("*/index.faiss")):
+            rebuild_index_as_hnsw(str(index_dir.parent))
+        sys.exit(0)
+
     os.makedirs("faiss_indexes", exist_ok=True)
     os.makedirs("extracted_images", exist_ok=True)
     create_robust_faiss_index(ROOT_DIR)
\ No newline at end of file
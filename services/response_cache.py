@@ -0,0 +1,49 @@
+"""
+Response Cache - Client-side, on-disk cache of backend responses keyed by canonicalized input
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import unicodedata
+from typing import Optional
+
+# Shared by every Streamlit session on this machine and kept across restarts
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".aicoach_cache", "responses.sqlite3")
+
+
+def cache_key(obj) -> str:
+    """Stable SHA-256 of a JSON-able input: key-sorted, NFC-normalized, lowercased, whitespace-collapsed"""
+    text = json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    text = " ".join(unicodedata.normalize("NFC", text).lower().split())
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Exact-match key -> JSON response store in SQLite (one short-lived connection per call, so any thread can use it)"""
+
+    def __init__(self, path: str = CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached response for `key`, or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, response: dict):
+        """Store (or replace) the response for `key`"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(response), time.time())
+            )
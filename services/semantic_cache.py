@@ -0,0 +1,194 @@
+"""
+Semantic Cache - Reuses LLM responses for identical or near-identical inputs
+"""
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    Two-tier response cache persisted to a pickle file:
+    1. Exact - SHA-256 of the whitespace/case-normalized text (dict lookup)
+    2. Semantic - cosine similarity of the text embedding against earlier inputs (FAISS inner product)
+
+    Entries are grouped by namespace, so only inputs asked in the same context can match each other.
+    With `ttl` (seconds) set, entries older than that are treated as misses and dropped.
+    With `threshold=None` the semantic tier is off: only exact matches hit, and nothing is embedded.
+    Each put rewrites the whole file, so each tier is capped at `max_entries` (oldest dropped first).
+    """
+
+    def __init__(self, path: str, embeddings, threshold: Optional[float] = 0.95, ttl: Optional[float] = None,
+                 max_entries: int = 1000):
+        self.path = path
+        self.embeddings = embeddings  # LangChain embeddings; must return normalized vectors
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.exact: Dict[str, tuple] = {}  # key -> (response, created_at, namespace)
+        self.entries: Dict[str, List[tuple]] = {}  # namespace -> [(vector, response, created_at)]
+        self.indexes: Dict[str, "faiss.Index"] = {}
+        self._load()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    @classmethod
+    def _key(cls, namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{cls._normalize(text)}".encode()).hexdigest()
+
+    def _embed(self, text: str) -> np.ndarray:
+        return np.asarray([self.embeddings.embed_query(self._normalize(text))], dtype="float32")
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    def get(self, text: str, namespace: str = "default") -> Optional[dict]:
+        """Return the cached response for `text`, or None on a miss"""
+        key = self._key(namespace, text)
+        with self.lock:
+            if key in self.exact:
+                response, created_at, _ = self.exact[key]
+                if not self._expired(created_at):
+                    logger.info(f"Semantic cache: exact hit ({namespace})")
+                    return response
+                del self.exact[key]
+            if self.threshold is None:
+                return None
+            index = self.indexes.get(namespace)
+            if index is None or index.ntotal == 0:
+                return None
+
+        vector = self._embed(text)
+        with self.lock:
+            index = self.indexes.get(namespace)  # may have been pruned while embedding
+            if index is None:
+                return None
+            scores, ids = index.search(vector, 1)
+            score, idx = float(scores[0][0]), int(ids[0][0])
+            if idx >= 0 and score >= self.threshold:
+                _, response, created_at = self.entries[namespace][idx]
+                if self._expired(created_at):
+                    logger.debug(f"Semantic cache: expired hit ({namespace}), pruning")
+                    self._evict()
+                    self._save()
+                    return None
+                logger.info(f"Semantic cache: similar hit ({namespace}, similarity={score:.3f})")
+                return response
+        logger.debug(f"Semantic cache: miss ({namespace}, best similarity={score:.3f})")
+        return None
+
+    def put(self, text: str, response: dict, namespace: str = "default"):
+        """Store a response under both tiers (exact only with threshold=None) and persist the cache"""
+        vector = self._embed(text) if self.threshold is not None else None
+        created_at = time.time()
+        with self.lock:
+            self.exact[self._key(namespace, text)] = (response, created_at, namespace)
+            if vector is not None:
+                self._add(namespace, vector, response, created_at)
+            self._evict()
+            self._save()
+
+    def drop_namespaces(self, prefix: str, keep: str):
+        """Drop every namespace starting with `prefix` except `keep` - e.g. ones keyed by an outdated fingerprint"""
+        def stale(namespace: Optional[str]) -> bool:
+            return namespace is not None and namespace.startswith(prefix) and namespace != keep
+
+        with self.lock:
+            exact = {key: value for key, value in self.exact.items() if not stale(value[2])}
+            namespaces = [namespace for namespace in self.entries if stale(namespace)]
+            if len(exact) == len(self.exact) and not namespaces:
+                return
+            self.exact = exact
+            for namespace in namespaces:
+                del self.entries[namespace], self.indexes[namespace]
+            logger.info(f"Semantic cache: dropped stale '{prefix}' namespaces")
+            self._save()
+
+    def _add(self, namespace: str, vector: np.ndarray, response: dict, created_at: float):
+        import faiss  # only needed once there is something to index
+        if namespace not in self.indexes:
+            self.indexes[namespace] = faiss.IndexFlatIP(vector.shape[1])
+            self.entries[namespace] = []
+        self.indexes[namespace].add(vector)
+        self.entries[namespace].append((vector, response, created_at))
+
+    def _evict(self):
+        """Drop expired entries, then the oldest beyond max_entries in each tier (caller holds the lock)"""
+        exact = [(key, value) for key, value in self.exact.items() if not self._expired(value[1])]
+        if len(exact) > self.max_entries:
+            exact.sort(key=lambda item: item[1][1])
+            exact = exact[-self.max_entries:]
+        self.exact = dict(exact)
+
+        total = sum(len(entries) for entries in self.entries.values())
+        entries = [(namespace, entry) for namespace, namespace_entries in self.entries.items()
+                   for entry in namespace_entries if not self._expired(entry[2])]
+        if len(entries) == total and total <= self.max_entries:
+            return
+        # Something goes: rebuild the indexes from the surviving entries
+        entries.sort(key=lambda item: item[1][2])
+        self.entries, self.indexes = {}, {}
+        for namespace, entry in entries[-self.max_entries:]:
+            self._add(namespace, *entry)
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"exact": self.exact, "entries": self.entries}, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not persist semantic cache to {self.path}: {e}")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            # Caches written before timestamps were stored count as created now; entries written
+            # before namespaces were stored have none (they only leave through the TTL / size cap)
+            loaded_at = time.time()
+            self.exact = {}
+            for key, value in data.get("exact", {}).items():
+                if not isinstance(value, tuple):
+                    value = (value, loaded_at)
+                self.exact[key] = value if len(value) == 3 else (*value, None)
+            for namespace, entries in (data.get("entries", {}) if self.threshold is not None else {}).items():
+                for vector, response, *created_at in entries:
+                    self._add(namespace, vector, response, created_at[0] if created_at else loaded_at)
+            self._evict()
+            logger.info(f"Loaded semantic cache from {self.path}: {len(self.exact)} entries")
+        except Exception as e:
+            logger.warning(f"Could not load semantic cache from {self.path}: {e}, starting empty")
+            self.exact, self.entries, self.indexes = {}, {}, {}
+
+
+_CACHES: Dict[str, SemanticCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_semantic_cache(path: str, embeddings, threshold: Optional[float] = 0.95, ttl: Optional[float] = None,
+                       max_entries: int = 1000) -> SemanticCache:
+    """
+    Process-wide SemanticCache for `path` (created on first use).
+
+    Every cache rewrites its whole pickle from memory on put, so two instances over the same
+    file would silently drop each other's entries - callers share one instance per file instead.
+    """
+    with _CACHES_LOCK:
+        if path not in _CACHES:
+            _CACHES[path] = SemanticCache(path, embeddings, threshold=threshold, ttl=ttl, max_entries=max_entries)
+        return _CACHES[path]
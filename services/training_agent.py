@@ -23,7 +23,47 @@ class TrainingAgent:
         logger.info(f"  Knowledge Base: {knowledge_base}")
         logger.info("="*80)
         
-        # Validate level
+        invalid = self._validate_level(level)
+        if invalid:
+            return invalid
+        
+        logger.info(f"Routing to {level} content generation")
+        return self.generate_content(level, knowledge_base)
+    
+    def stream_request(self, level, knowledge_base):
+        """
+        Streaming variant of handle_request.
+        
+        Yields:
+            {"token": str} events while the lesson is generated, or a single
+            {"error": ..., "message": ...} event if generation fails
+        """
+        logger.info("="*80)
+        logger.info("TRAINING AGENT: Handling streaming request")
+        logger.info(f"  Level: {level}")
+        logger.info(f"  Knowledge Base: {knowledge_base}")
+        logger.info("="*80)
+        
+        invalid = self._validate_level(level)
+        if invalid:
+            yield invalid
+            return
+        
+        try:
+            content = self.comprehensive_coach.retrieve_lesson_content(knowledge_base, level)
+            logger.info(f"Retrieved content length: {len(content)} characters")
+            
+            total_length = 0
+            for token in self.comprehensive_coach.stream_comprehensive_lesson(knowledge_base, level, content):
+                total_length += len(token)
+                yield {"token": token}
+            logger.info(f"Streamed lesson length: {total_length} characters")
+        except Exception as e:
+            yield self._error_response(level, e)
+    
+    @staticmethod
+    def _validate_level(level):
+        """Return an error response for an unknown level, or None if valid"""
         valid_levels = ["beginner", "intermediate", "advanced", "architecture"]
         if level not in valid_levels:
             logger.warning(f"Invalid level requested: {level}")
@@ -31,9 +71,7 @@ class TrainingAgent:
                 "error": "Invalid level",
                 "message": f"Invalid level '{level}'. Please choose one of: {', '.join(valid_levels)}."
             }
-        
-        logger.info(f"Routing to {level} content generation")
-        return self.generate_content(level, knowledge_base)
+        return None
 
     def generate_content(self, level: str, knowledge_base: str):
         """
@@ -55,10 +93,7 @@ class TrainingAgent:
         try:
             # Step 1: Retrieve training content from FAISS
             logger.info("Step 1: Retrieving training content from FAISS")
-            content = retrieve_training_content.invoke({
-                "knowledge_base": knowledge_base,
-                "level": level
-            })
+            content = self.comprehensive_coach.retrieve_lesson_content(knowledge_base, level)
             logger.info(f"Retrieved content length: {len(content)} characters")
             
             # Step 2: Generate comprehensive lesson via LLM
@@ -71,20 +106,25 @@ class TrainingAgent:
                 "training_content": lesson
             }
         except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Error generating {level} content: {error_msg}")
-            logger.exception("Full traceback:")
-            
-            # Check for connection-related errors
-            if "Connection" in error_msg or "connection" in error_msg.lower() or "timeout" in error_msg.lower():
-                logger.error("Connection-related error detected")
-                return {
-                    "error": "LLM Connection Error",
-                    "message": f"Unable to connect to the AI model service. Please check your network connection and Ericsson ELI gateway access. Error: {error_msg}"
-                }
-            
-            # Generic error response
+            return self._error_response(level, e)
+    
+    @staticmethod
+    def _error_response(level: str, e: Exception):
+        """Map a generation failure to the error response returned to the API"""
+        error_msg = str(e)
+        logger.error(f"Error generating {level} content: {error_msg}")
+        logger.exception("Full traceback:")
+        
+        # Check for connection-related errors
+        if "Connection" in error_msg or "connection" in error_msg.lower() or "timeout" in error_msg.lower():
+            logger.error("Connection-related error detected")
             return {
-                "error": "Training Generation Error",
-                "message": f"Failed to generate training content: {error_msg}"
+                "error": "LLM Connection Error",
+                "message": f"Unable to connect to the AI model service. Please check your network connection and Ericsson ELI gateway access. Error: {error_msg}"
             }
+        
+        # Generic error response
+        return {
+            "error": "Training Generation Error",
+            "message": f"Failed to generate training content: {error_msg}"
+        }
@@ -1,9 +1,14 @@
 """
 User Service - Handles user authentication, profiles, and progress tracking
 """
+import base64
+import hashlib
+import hmac
 import json
 import os
 import logging
+import secrets
+import time
 from datetime import datetime
 from typing import Dict, List, Optional
 from pathlib import Path
@@ -14,9 +19,31 @@ logger = logging.getLogger(__name__)
 USER_DATA_FILE = "data/users.json"
 USER_PROGRESS_FILE = "data/user_progress.json"
 
+# Signing key for auth tokens: AUTH_SECRET, else a key generated once and kept next to the user store
+AUTH_SECRET_FILE = "data/auth_secret.key"
+AUTH_TOKEN_TTL = 8 * 60 * 60  # seconds
+
 # Create data directory if it doesn't exist
 os.makedirs("data", exist_ok=True)
 
+def _load_auth_secret() -> bytes:
+    """Token signing key that survives restarts and --reload (so issued tokens stay valid)"""
+    env_secret = os.environ.get("AUTH_SECRET", "")
+    if env_secret:
+        return env_secret.encode()
+    try:
+        # O_EXCL: if several workers start at once, exactly one creates the key and the rest read it
+        fd = os.open(AUTH_SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return Path(AUTH_SECRET_FILE).read_bytes()
+    secret = secrets.token_bytes(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    logger.info(f"Generated auth token signing key: {AUTH_SECRET_FILE}")
+    return secret
+
+AUTH_SECRET = _load_auth_secret()
+
 # Default dummy users (for development)
 DEFAULT_USERS = {
     "admin": {
@@ -88,6 +115,26 @@ def authenticate_user(username: str, password: str) -> Optional[Dict]:
         logger.warning(f"Authentication failed for username: {username}")
         return None
 
+def create_auth_token(username: str) -> str:
+    """Issue a signed, expiring bearer token for an authenticated user"""
+    body = base64.urlsafe_b64encode(f"{username}:{int(time.time()) + AUTH_TOKEN_TTL}".encode()).decode()
+    signature = hmac.new(AUTH_SECRET, body.encode(), hashlib.sha256).hexdigest()
+    return f"{body}.{signature}"
+
+def verify_auth_token(token: str) -> Optional[str]:
+    """Return the username a token was issued to, or None if it is forged or expired"""
+    try:
+        body, signature = token.rsplit(".", 1)
+        expected = hmac.new(AUTH_SECRET, body.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature, expected):
+            return None
+        username, expires = base64.urlsafe_b64decode(body.encode()).decode().rsplit(":", 1)
+        if int(expires) < time.time():
+            return None
+        return username
+    except (ValueError, UnicodeDecodeError):
+        return None
+
 def get_user_profile(username: str) -> Optional[Dict]:
     """Get user profile information"""
     users = load_users()
@@ -259,3 +306,13 @@ def get_recommendations(username: str) -> List[Dict]:
     
     return recommendations
 
+def get_user_dashboard(username: str) -> Optional[Dict]:
+    """Profile, statistics and recommendations for the profile page in one call, or None for an unknown user"""
+    profile = get_user_profile(username)
+    if profile is None:
+        return None
+    return {
+        "profile": profile,
+        "statistics": get_user_statistics(username),
+        "recommendations": get_recommendations(username)
+    }